@@ -0,0 +1,307 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the probing and analysis hot paths.
+
+Everything runs on CPU with synthetic data; `vllm.LLM` is replaced by `FakeLLM`.
+
+    python -m benchmarks.run --scale small --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --scale small --baseline benchmarks/baseline.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import click
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from factprobe.probe import FactProbe  # noqa: E402
+from factprobe.utils.analysis import analyse_results_all_freqs, freq_dict_from_triple_df  # noqa: E402
+from factprobe.utils.preprocess import clean_names, filter_nonenglish_names, remove_lowercased_duplicates  # noqa: E402
+from factprobe.utils.stats import mcnemar_p  # noqa: E402
+from benchmarks.synthetic import FakeLLM, make_aliases, make_relation_df, make_results, write_dolma_gz  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+JSON_GZ_TO_TEXT = REPO_ROOT / "data_index" / "dolma-to-fmindex" / "helpers" / "json_gz_to_text_gz.py"
+
+# (number of triples, aliases per entity, number of Dolma documents)
+SCALES = {
+    "small": {"rows": 200, "fanout": 2, "docs": 500},
+    "medium": {"rows": 2000, "fanout": 3, "docs": 5000},
+    "large": {"rows": 10000, "fanout": 4, "docs": 20000},
+}
+
+PROBE_CONFIG = {
+    "template_type": "statement",
+    "template_forward": "{subject} {predicate} {object}.",
+    "relation_forward": "is married to",
+    "template_backward": "{object} {predicate} {subject}.",
+    "relation_backward": "is married to",
+}
+
+# A case returns a callable to time and the number of items it processes
+Case = Callable[[Dict], Tuple[Callable[[], object], int]]
+
+
+def case_probe(scale: Dict):
+    df = make_relation_df(scale["rows"], scale["fanout"])
+    probe = FactProbe(llm=FakeLLM(), **PROBE_CONFIG)
+
+    def run():
+        random.seed(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return probe.probe(df)
+
+    return run, 2 * len(df) * scale["fanout"] ** 2
+
+
+def case_freq_dict(scale: Dict):
+    df = make_relation_df(scale["rows"], scale["fanout"])
+    return (lambda: freq_dict_from_triple_df(df)), len(df)
+
+
+def case_analysis(scale: Dict):
+    df = make_relation_df(scale["rows"], scale["fanout"])
+    results = make_results(df, scale["fanout"])
+    freq_dict = freq_dict_from_triple_df(df)
+
+    def run():
+        return {d: analyse_results_all_freqs(results, freq_dict, d) for d in ("high2low", "low2high")}
+
+    return run, len(df)
+
+
+def case_mcnemar(scale: Dict):
+    rng = random.Random(0)
+    # mix of small (exact binomial) and large (chi-squared) discordant counts
+    pairs = [(rng.randint(0, 15), rng.randint(0, 15)) for _ in range(scale["rows"] // 2)]
+    pairs += [(rng.randint(20, 5000), rng.randint(20, 5000)) for _ in range(scale["rows"] // 2)]
+
+    def run():
+        return [mcnemar_p(a, b) for a, b in pairs]
+
+    return run, len(pairs)
+
+
+def case_preprocess(scale: Dict):
+    rng = random.Random(0)
+    names = [make_aliases(rng, scale["fanout"] * 4) for _ in range(scale["rows"])]
+
+    def run():
+        return [
+            remove_lowercased_duplicates(filter_nonenglish_names(clean_names(n, remove_parenthesis=True)))
+            for n in names
+        ]
+
+    return run, sum(len(n) for n in names)
+
+
+# Runs a script (`path`) or code (`code`) and records its own peak RSS in KiB. On Linux `ru_maxrss` survives
+# `exec` and would include the forked benchmark process, so the per-address-space `VmHWM` is used instead.
+_CHILD_WRAPPER = """
+import resource, runpy, sys
+mode, target, out = sys.argv[1:4]
+sys.argv = [target, *sys.argv[4:]]
+try:
+    runpy.run_path(target, run_name="__main__") if mode == "path" else exec(target)
+finally:
+    try:
+        peak = next(int(l.split()[1]) for l in open("/proc/self/status") if l.startswith("VmHWM:"))
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak // 1024 if sys.platform == "darwin" else peak
+    with open(out, "w") as f:
+        f.write(str(peak))
+"""
+
+
+def _run_python(mode: str, target: str, *args: str, **kwargs) -> float:
+    """Run Python code or a script in a fresh interpreter and return its peak RSS in MB."""
+    with tempfile.NamedTemporaryFile(suffix=".rss") as rss:
+        subprocess.run([sys.executable, "-c", _CHILD_WRAPPER, mode, target, rss.name, *args], check=True, **kwargs)
+        with open(rss.name) as f:
+            return int(f.read()) / 1024
+
+
+def case_json_gz_to_text(scale: Dict):
+    # removed once `run`, which holds the last reference, is released after the case has been measured
+    tmp_dir = tempfile.TemporaryDirectory(prefix="factprobe_bench_")
+    input_path = os.path.join(tmp_dir.name, "dolma.json.gz")
+    output_path = os.path.join(tmp_dir.name, "dolma.txt")
+    write_dolma_gz(input_path, scale["docs"])
+
+    def run():
+        return _run_python(
+            "path", str(JSON_GZ_TO_TEXT), input_path, output_path, cwd=tmp_dir.name, stdout=subprocess.DEVNULL
+        )
+
+    return run, scale["docs"]
+
+
+# Modules that analysis-only entry points must not import
+HEAVY_MODULES = ["vllm", "torch", "transformers", "deeponto"]
+
+
+def _import_case(module: str) -> Case:
+    """Time a fresh interpreter importing `module`; fails if it pulls in any of `HEAVY_MODULES`."""
+    code = (
+        f"import sys, {module}; "
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]; "
+        "sys.exit(f'heavy modules imported: {heavy}' if heavy else 0)"
+    )
+
+    def case(scale: Dict):
+        def run():
+            return _run_python("code", code, cwd=REPO_ROOT)
+
+        return run, 1
+
+    return case
+
+
+CASES: Dict[str, Case] = {
+    "probe": case_probe,
+    "freq_dict_from_triple_df": case_freq_dict,
+    "analyse_results_all_freqs": case_analysis,
+    "mcnemar_p": case_mcnemar,
+    "preprocess_names": case_preprocess,
+    "json_gz_to_text_gz": case_json_gz_to_text,
+    "import_factprobe": _import_case("factprobe"),
+    "import_factprobe_cli": _import_case("factprobe.cli"),
+    "import_factprobe_utils_analysis": _import_case("factprobe.utils.analysis"),
+}
+
+# Cases that run in a subprocess return the peak RSS (MB) of the child instead of being traced with `tracemalloc`
+SUBPROCESS_CASES = {"json_gz_to_text_gz", "import_factprobe", "import_factprobe_cli", "import_factprobe_utils_analysis"}
+
+
+def measure(name: str, run: Callable[[], object], n_items: int, repeat: int) -> Dict[str, float]:
+    """Time `run` `repeat` times and measure its peak memory in one additional run."""
+    run()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    if name in SUBPROCESS_CASES:
+        peak_mb = run()
+    else:
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 1024**2
+
+    median = statistics.median(timings)
+    return {
+        "items": n_items,
+        "seconds_min": round(min(timings), 6),
+        "seconds_median": round(median, 6),
+        "items_per_sec": round(n_items / median, 2) if median > 0 else float("inf"),
+        "peak_mem_mb": round(peak_mb, 3),
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a message for every case whose median time or peak memory regressed beyond `tolerance`."""
+    regressions = []
+    for case, stats in current["results"].items():
+        if case not in baseline.get("results", {}):
+            continue
+        base = baseline["results"][case]
+        for metric in ("seconds_median", "peak_mem_mb"):
+            if base[metric] > 0 and stats[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{case}.{metric}: {stats[metric]} vs baseline {base[metric]} "
+                    f"(+{(stats[metric] / base[metric] - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+@click.command()
+@click.option("--scale", "-s", type=click.Choice(list(SCALES)), default="small", help="Size of the synthetic data.")
+@click.option(
+    "--case", "-k", "cases", multiple=True, type=click.Choice(list(CASES)), help="Cases to run (default all)."
+)
+@click.option("--repeat", "-r", type=int, default=5, help="Number of timed runs per case.")
+@click.option("--output", "-o", type=click.Path(), default=None, help="Path to save the benchmark results (JSON).")
+@click.option("--baseline", "-b", type=click.Path(exists=True), default=None, help="Baseline results to compare with.")
+@click.option("--save-baseline", type=click.Path(), default=None, help="Save the results as a new baseline.")
+@click.option("--tolerance", type=float, default=0.2, help="Allowed relative slowdown/memory growth vs. baseline.")
+def main(
+    scale: str,
+    cases: Tuple[str, ...],
+    repeat: int,
+    output: Optional[str],
+    baseline: Optional[str],
+    save_baseline: Optional[str],
+    tolerance: float,
+):
+    """Run the benchmark suite and optionally compare it against a saved baseline."""
+    current = {
+        "meta": {
+            "scale": scale,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": {},
+    }
+    for name in cases or CASES:
+        run, n_items = CASES[name](SCALES[scale])
+        stats = measure(name, run, n_items, repeat)
+        current["results"][name] = stats
+        click.echo(
+            f"{name:<28} {stats['seconds_median']:>10.4f}s  {stats['items_per_sec']:>12.1f} items/s  "
+            f"{stats['peak_mem_mb']:>9.2f} MB"
+        )
+
+    for path in (output, save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(current, f, indent=2)
+            click.echo(f"Benchmark results saved to: {path}")
+
+    if baseline:
+        with open(baseline) as f:
+            base = json.load(f)
+        if base["meta"].get("scale") != scale:
+            raise click.UsageError(f"Baseline was recorded at scale={base['meta'].get('scale')}, not {scale}.")
+        regressions = compare(current, base, tolerance)
+        if regressions:
+            click.echo("Regressions against baseline:", err=True)
+            for msg in regressions:
+                click.echo(f"  {msg}", err=True)
+            sys.exit(1)
+        click.echo(f"No regressions against baseline (tolerance {tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import random
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+# Entity frequencies are drawn so that every bucket used by `analyse_results_all_freqs` is populated
+FREQ_BUCKETS = [(0, 1000), (1000, 10000), (10000, 100000), (100000, 10000000)]
+
+SYLLABLES = ["an", "ber", "co", "del", "fa", "gor", "hil", "ix", "jo", "ka", "lo", "mar", "no", "pe", "ra", "su", "ti"]
+
+
+def _random_name(rng: random.Random, n_parts: int = 2) -> str:
+    parts = []
+    for _ in range(n_parts):
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        parts.append(word.capitalize())
+    return " ".join(parts)
+
+
+def make_aliases(rng: random.Random, fanout: int) -> List[str]:
+    """Make `fanout` aliases for one entity, including the kind of noise the `preprocess` functions remove."""
+    base = _random_name(rng)
+    aliases = [base]
+    while len(aliases) < fanout:
+        variant = rng.choice(
+            [
+                base.lower(),
+                base.replace(" ", "_"),
+                f"{base} ({_random_name(rng, 1)})",
+                f"{_random_name(rng, 1)} {base.split()[-1]}",
+                f"{base}é",
+            ]
+        )
+        aliases.append(variant)
+    return aliases
+
+
+def make_relation_df(num_rows: int, alias_fanout: int, seed: int = 42) -> pd.DataFrame:
+    """Make a synthetic relation dataset with the same columns as the probing datasets.
+
+    Args:
+        num_rows: Number of triples.
+        alias_fanout: Number of aliases per subject/object, so each triple renders `alias_fanout ** 2` prompts.
+        seed: Random seed.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(num_rows):
+        subject_bucket = rng.choice(FREQ_BUCKETS)
+        object_bucket = rng.choice(FREQ_BUCKETS)
+        rows.append(
+            {
+                "subject": f"Q{2 * i + 1}",
+                "object": f"Q{2 * i + 2}",
+                "subject_name": str(make_aliases(rng, alias_fanout)),
+                "object_name": str(make_aliases(rng, alias_fanout)),
+                "subject_count": rng.randint(*subject_bucket),
+                "object_count": rng.randint(*object_bucket),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def make_results(df: pd.DataFrame, alias_fanout: int, seed: int = 42) -> Dict[str, Dict[Tuple[str, str], Dict]]:
+    """Make a synthetic results dict in the format returned by `FactProbe.probe`."""
+    rng = random.Random(seed)
+    results = {"forward": {}, "backward": {}}
+    n_prompts = alias_fanout**2
+    for s, o in df[["subject", "object"]].itertuples(index=False):
+        for direction in ("forward", "backward"):
+            answers = [rng.random() < 0.4 for _ in range(n_prompts)]
+            results[direction][(s, o)] = {
+                "text": ["True" if a else "False" for a in answers],
+                "answer_em": answers,
+                "answer_in": answers,
+                "logprobs": [{} for _ in answers],
+            }
+    return results
+
+
+def write_dolma_gz(path: str, num_docs: int, doc_chars: int = 2000, seed: int = 42):
+    """Write a synthetic Dolma-style `.json.gz` file (one JSON document per line with a `text` field)."""
+    rng = random.Random(seed)
+    with gzip.open(path, mode="wt", encoding="utf-8") as f:
+        for i in range(num_docs):
+            words = []
+            length = 0
+            while length < doc_chars:
+                word = _random_name(rng, 1)
+                words.append(word)
+                length += len(word) + 1
+            text = " ".join(words) + ("\x00" if i % 7 == 0 else "")
+            f.write(json.dumps({"id": str(i), "text": text}) + "\n")
+
+
+@dataclass
+class FakeLogprob:
+    logprob: float
+    rank: int
+    decoded_token: str
+
+
+@dataclass
+class FakeCompletionOutput:
+    text: str
+    token_ids: List[int]
+    logprobs: List[Dict[int, FakeLogprob]]
+
+
+@dataclass
+class FakeRequestOutput:
+    prompt_token_ids: List[int]
+    outputs: List[FakeCompletionOutput]
+    num_cached_tokens: int = 0
+
+
+@dataclass
+class FakeLLM:
+    """Deterministic CPU-only stand-in for `vllm.LLM`.
+
+    The answer for a prompt only depends on its user message, so repeated runs produce identical results.
+    Output objects mimic the attributes of vLLM's `RequestOutput` that `FactProbe` reads.
+    """
+
+    answers: Tuple[str, str] = ("True", "False")
+    num_logprobs: int = 10
+    calls: int = field(default=0, init=False)
+
+    def _answer(self, content: str) -> FakeRequestOutput:
+        h = zlib.crc32(content.encode("utf-8"))
+        text = self.answers[h % 2]
+        top = {
+            token_id: FakeLogprob(logprob=-0.1 * (rank + 1), rank=rank + 1, decoded_token=f"tok{token_id}")
+            for rank, token_id in enumerate(range(h % 1000, h % 1000 + self.num_logprobs))
+        }
+        return FakeRequestOutput(
+            prompt_token_ids=list(range(len(content.split()))),
+            outputs=[FakeCompletionOutput(text=text, token_ids=[h % 1000], logprobs=[top])],
+        )
+
+    def chat(self, messages, sampling_params=None, **kwargs):
+        self.calls += 1
+        return [self._answer(conversation[-1]["content"]) for conversation in messages]
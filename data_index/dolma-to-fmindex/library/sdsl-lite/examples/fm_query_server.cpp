@@ -0,0 +1,142 @@
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <iostream>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <vector>
+#include <sdsl/suffix_array_algorithm.hpp>
+#include <sdsl/suffix_arrays.hpp>
+
+using namespace sdsl;
+using namespace std;
+using namespace std::chrono;
+
+/**
+ Long-lived query worker: loads a group of FM-index shards once and answers count requests on stdin.
+
+ g++ -std=c++17  -O3 -DNDEBUG -msse4.2 -mbmi -mbmi2 -Wall -Wextra -pedantic -funroll-loops -D__extern_always_inline="extern __always_inline"  -ffast-math \
+   -I/PATHTO/library/sdsl-lite/include -o fm_query_server.exe fm_query_server.cpp
+
+ Protocol (one request at a time, newline-delimited, queries must not contain newlines):
+   -> READY <number of shards>            printed once all shards are loaded
+   <- COUNT <n>                           followed by n query lines
+   -> <c_1> <c_2> ... <c_n>               occurrences of each query summed over the loaded shards
+   <- COOCCUR <n> <window> <max_locations>
+                                          followed by 2n lines, the two strings of each pair
+   -> <c_1> <c_2> ... <c_n>               occurrences of the rarer string of each pair with the other string
+                                          at most <window> characters before or after it, summed over shards;
+                                          if the rarer string occurs more than <max_locations> times in a
+                                          shard, the count is an estimate: only <max_locations> occurrences,
+                                          spread evenly over its suffix-array range, are checked and the hits
+                                          scaled to all occurrences
+   <- QUIT                                exit
+ Errors are reported as a single line starting with "ERROR".
+*/
+
+typedef csa_wt<wt_huff<rrr_vector<127>>, 512, 1024> fm_index_type;
+
+// Count occurrences of `a` and `b` within `window` characters of each other in one shard
+size_t cooccur(const fm_index_type& fm_index, const string& a, const string& b, size_t window, size_t max_locations) {
+    if (a.empty() || b.empty()) {
+        return 0;
+    }
+    size_t a_sp = 0, a_ep = 0, b_sp = 0, b_ep = 0;
+    size_t n_a = backward_search(fm_index, 0, fm_index.size() - 1, a.begin(), a.end(), a_sp, a_ep);
+    size_t n_b = backward_search(fm_index, 0, fm_index.size() - 1, b.begin(), b.end(), b_sp, b_ep);
+    if (n_a == 0 || n_b == 0) {
+        return 0;
+    }
+
+    // Locate the rarer string and look for the other one in the surrounding text
+    const bool a_is_anchor = n_a <= n_b;
+    const string& anchor = a_is_anchor ? a : b;
+    const string& other = a_is_anchor ? b : a;
+    const size_t sp = a_is_anchor ? a_sp : b_sp;
+    const size_t n = a_is_anchor ? n_a : n_b;
+    const size_t n_checked = min(n, max(max_locations, (size_t) 1));
+    const size_t text_end = fm_index.size() - 2;  // last character before the sentinel
+    const size_t margin = window + other.size();
+
+    // Suffixes in [sp, sp + n) are sorted by the text following the anchor, so a prefix of the range would be a
+    // biased sample; take evenly spaced entries across the whole range instead
+    size_t hits = 0;
+    for (size_t i = 0; i < n_checked; ++i) {
+        size_t pos = fm_index[sp + (size_t) ((double) i * n / n_checked)];
+        size_t begin = pos > margin ? pos - margin : 0;
+        size_t end = min(pos + anchor.size() + margin - 1, text_end);
+        auto context = extract(fm_index, begin, end);
+        if (context.find(other) != string::npos) {
+            ++hits;
+        }
+    }
+    if (n_checked < n) {
+        return (size_t) llround((double) hits * n / n_checked);
+    }
+    return hits;
+}
+
+int main(int argc, char ** argv) {
+    if (argc < 2) {
+        cerr << "Usage: " << argv[0] << " fm_index_file [fm_index_file ...]" << endl;
+        return 1;
+    }
+    ios::sync_with_stdio(false);
+
+    // Load all shards of this group once
+    auto start_time = high_resolution_clock::now();
+    vector<fm_index_type> shards(argc - 1);
+    for (int i = 1; i < argc; ++i) {
+        if (!load_from_file(shards[i - 1], argv[i])) {
+            cout << "ERROR: Could not load FM-index " << argv[i] << endl;
+            return 1;
+        }
+    }
+    auto duration = duration_cast<milliseconds>(high_resolution_clock::now() - start_time);
+    cerr << "Loaded " << shards.size() << " shards in " << duration.count() << " ms." << endl;
+    cout << "READY " << shards.size() << endl;
+
+    string line;
+    while (getline(cin, line)) {
+        istringstream header(line);
+        string op;
+        header >> op;
+        if (op == "QUIT") {
+            break;
+        } else if (op == "COUNT") {
+            size_t n = 0;
+            header >> n;
+            vector<string> queries(n);
+            for (size_t i = 0; i < n && getline(cin, queries[i]); ++i) {
+            }
+            ostringstream response;
+            for (size_t i = 0; i < n; ++i) {
+                size_t total = 0;
+                for (const auto& fm_index : shards) {
+                    total += sdsl::count(fm_index, queries[i].begin(), queries[i].end());
+                }
+                response << (i ? " " : "") << total;
+            }
+            cout << response.str() << endl;
+        } else if (op == "COOCCUR") {
+            size_t n = 0, window = 0, max_locations = 0;
+            header >> n >> window >> max_locations;
+            vector<string> pairs(2 * n);
+            for (size_t i = 0; i < 2 * n && getline(cin, pairs[i]); ++i) {
+            }
+            ostringstream response;
+            for (size_t i = 0; i < n; ++i) {
+                size_t total = 0;
+                for (const auto& fm_index : shards) {
+                    total += cooccur(fm_index, pairs[2 * i], pairs[2 * i + 1], window, max_locations);
+                }
+                response << (i ? " " : "") << total;
+            }
+            cout << response.str() << endl;
+        } else {
+            cout << "ERROR: Unknown request: " << line << endl;
+        }
+    }
+    return 0;
+}
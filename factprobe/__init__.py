@@ -14,4 +14,11 @@
 
 __version__ = "0.1.0"
 
-from .probe import FactProbe  # noqa: F401
+
+def __getattr__(name):
+    # `FactProbe` is imported on first access so that `factprobe.utils` and the CLI stay light-weight
+    if name == "FactProbe":
+        from .probe import FactProbe
+
+        return FactProbe
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
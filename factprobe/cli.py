@@ -0,0 +1,267 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The `factprobe` command line interface.
+
+Only `click` and the standard library are imported at module level; each subcommand imports what it needs
+when it runs, so `factprobe analyse` never loads vLLM/torch.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from factprobe.utils.metrics import STAGES
+
+
+@click.group()
+def main():
+    """FactProbe: probe factual asymmetry in LLMs."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+@main.command()
+@click.option("--config_file", "-c", type=str, required=True, help="Path to the configuration file.")
+@click.option("--model", "-m", type=str, default=None, help="Name of the model to use (overrides `config.model`).")
+@click.option("--run_all", is_flag=True, help="Run on all triples, ignoring count thresholds.")
+@click.option("--run_test", is_flag=True, help="Run in test mode with only 100 samples.")
+@click.option(
+    "--metrics_dir", type=str, default=None, help="Write per-batch stage timings and counters to this directory."
+)
+@click.option("--profile_stage", type=click.Choice(STAGES), default=None, help="Run `cProfile` around this stage.")
+@click.option("--sample", is_flag=True, help="Sample triples per frequency bucket until significance or budget.")
+@click.option("--pretokenize", is_flag=True, help="Tokenize chat prompts in a process pool and pass token ids to vLLM.")
+def probe(
+    config_file: str,
+    model: Optional[str],
+    run_all: bool,
+    run_test: bool,
+    metrics_dir: Optional[str],
+    profile_stage: Optional[str],
+    sample: bool,
+    pretokenize: bool,
+):
+    """Run the probing pipeline with vLLM."""
+    if profile_stage and not metrics_dir:
+        raise click.UsageError("--profile_stage requires --metrics_dir.")
+    if sample and run_all:
+        raise click.UsageError("--sample and --run_all are mutually exclusive.")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from factprobe.pipeline import run_probe
+
+    run_probe(config_file, model, run_all, run_test, metrics_dir, profile_stage, sample, pretokenize)
+
+
+@main.command()
+@click.argument("results_path", type=click.Path(exists=True))
+@click.argument("triple_df_path", type=click.Path(exists=True))
+@click.option("--output", "-o", type=click.Path(), help="Path to save the analysis results")
+@click.option(
+    "--answer_key",
+    type=click.Choice(["answer_em", "answer_in", "answer_judge"]),
+    default="answer_em",
+    help="Correctness criterion (`answer_judge` requires `factprobe judge` to have been run).",
+)
+def analyse(results_path: str, triple_df_path: str, output: Optional[str], answer_key: str):
+    """Analyze experiment results from .pkl files.
+
+    RESULTS_PATH: Path to the .pkl file containing experiment results
+    TRIPLE_DF_PATH: Path to the .csv file containing the triple DataFrame
+    """
+    from factprobe.utils.analysis import analyse_experiment
+
+    output = output or str(Path(results_path).with_suffix(".analysis.json"))
+    analyse_experiment(results_path, triple_df_path, output, answer_key)
+    click.echo(f"Analysis results saved to: {output}")
+
+
+@main.command()
+@click.argument("results_paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--judge_model", "-m", type=str, required=True, help="Name of the judge model.")
+@click.option("--template_type", "-t", type=click.Choice(["question", "statement"]), required=True)
+@click.option(
+    "--mode", type=click.Choice(["affirmation", "semantic_match"]), default="affirmation", help="Judge prompt to use."
+)
+@click.option("--cache", type=click.Path(), default=None, help="Persistent verdict cache (.pkl or .json).")
+@click.option("--batch_size", type=int, default=10000, help="Number of judge prompts per engine call.")
+def judge(results_paths: tuple, judge_model: str, template_type: str, mode: str, cache: Optional[str], batch_size: int):
+    """Judge outputs that failed the EM check and add `answer_judge` to the results files.
+
+    RESULTS_PATHS: One or more .pkl files produced by `factprobe probe`; they are judged together so that
+    identical responses across files are only judged once, and updated in place.
+    """
+    from vllm import LLM, SamplingParams
+    from factprobe.judge import FactJudge
+    from factprobe.utils.io import load_file, save_file
+
+    results = [load_file(path) for path in results_paths]
+    llm = LLM(model=judge_model)
+    fact_judge = FactJudge(llm, judge_model, template_type, mode=mode, cache_path=cache, batch_size=batch_size)
+    fact_judge.judge(results, SamplingParams(temperature=0.0, max_tokens=8))
+    for path, result in zip(results_paths, results):
+        save_file(result, path)
+        click.echo(f"Judged results saved to: {path}")
+
+
+@main.command()
+@click.argument("input_path", type=click.Path(exists=True))
+@click.argument("output_path", type=click.Path())
+@click.option("--remove_parenthesis", is_flag=True, help="Remove bracketed disambiguation from names.")
+@click.option("--keep_nonenglish", is_flag=True, help="Keep names with non-English characters.")
+def preprocess(input_path: str, output_path: str, remove_parenthesis: bool, keep_nonenglish: bool):
+    """Clean the `subject_name` and `object_name` alias lists of a triple CSV.
+
+    Triples left without a subject or object name are dropped.
+    """
+    import ast
+    import pandas as pd
+    from factprobe.utils.preprocess import preprocess_names
+
+    df = pd.read_csv(input_path)
+    for column in ["subject_name", "object_name"]:
+        df[column] = [
+            preprocess_names(ast.literal_eval(names), remove_parenthesis, english_only=not keep_nonenglish)
+            for names in df[column]
+        ]
+    keep = df["subject_name"].map(bool) & df["object_name"].map(bool)
+    df = df[keep]
+    df[["subject_name", "object_name"]] = df[["subject_name", "object_name"]].map(str)
+    df.to_csv(output_path, index=False)
+    click.echo(f"Preprocessed {len(df)} triples ({int((~keep).sum())} dropped) saved to: {output_path}")
+
+
+@main.command("index-query")
+@click.argument("fm_index_dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("entity_file", type=click.Path(exists=True))
+@click.argument("output_file", type=click.Path())
+@click.option("--executable", "-e", type=click.Path(exists=True), default=None, help="Path to `fm_get_freq.exe`.")
+@click.option("--server", "-s", type=click.Path(exists=True), default=None, help="Path to `fm_query_server.exe`.")
+@click.option("--jobs", "-j", type=int, default=16, help="Number of shards (groups with --server) queried in parallel.")
+@click.option("--worker_memory", type=float, default=None, help="Memory budget per server worker in GiB.")
+def index_query(
+    fm_index_dir: str,
+    entity_file: str,
+    output_file: str,
+    executable: Optional[str],
+    server: Optional[str],
+    jobs: int,
+    worker_memory: Optional[float],
+):
+    """Count entity names across all FM-index shards.
+
+    ENTITY_FILE is a JSON file mapping entity IDs to `{"names": [...]}`. With `--executable`, every shard is
+    swept once with `fm_get_freq`; with `--server`, shard groups are loaded by `fm_query_server` workers.
+    """
+    import json
+    from factprobe.utils.fmindex import FMIndexService, query_shards
+
+    if (executable is None) == (server is None):
+        raise click.UsageError("Exactly one of --executable and --server is required.")
+    if executable:
+        try:
+            counts = query_shards(fm_index_dir, entity_file, executable, output_file, jobs=jobs)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    else:
+        with open(entity_file) as f:
+            entities = {k: v["names"] for k, v in json.load(f).items() if "names" in v}
+        memory = int(worker_memory * 1024**3) if worker_memory else None
+        with FMIndexService(fm_index_dir, server, num_workers=jobs, worker_memory=memory) as service:
+            counts = service.count_entities(entities)
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, "w") as f:
+            json.dump(counts, f, indent=4)
+    click.echo(f"Counts of {len(counts)} entities saved to: {output_file}")
+
+
+@main.command("index-count")
+@click.argument("fm_index_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--server", "-s", type=click.Path(exists=True), required=True, help="Path to `fm_query_server.exe`.")
+@click.option("--jobs", "-j", type=int, default=16, help="Number of shard groups queried in parallel.")
+@click.option("--worker_memory", type=float, default=None, help="Memory budget per server worker in GiB.")
+def index_count(fm_index_dir: str, server: str, jobs: int, worker_memory: Optional[float]):
+    """Count query strings read from stdin (one per line) while keeping the shards loaded.
+
+    Piped input is counted as one batch; on a terminal every line is answered as it is entered.
+    """
+    import sys
+    from factprobe.utils.fmindex import FMIndexService
+
+    memory = int(worker_memory * 1024**3) if worker_memory else None
+    with FMIndexService(fm_index_dir, server, num_workers=jobs, worker_memory=memory) as service:
+        if sys.stdin.isatty():
+            click.echo("Ready for queries.", err=True)
+            for line in sys.stdin:
+                query = line.rstrip("\n")
+                if query:
+                    click.echo(f"{service.count([query])[0]}\t{query}")
+        else:
+            queries = [line.rstrip("\n") for line in sys.stdin if line.rstrip("\n")]
+            for query, count in zip(queries, service.count(queries)):
+                click.echo(f"{count}\t{query}")
+
+
+@main.command()
+@click.argument("fm_index_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--config_file", "-c", type=str, required=True, help="Probing configuration (dataset and templates).")
+@click.option("--server", "-s", type=click.Path(exists=True), required=True, help="Path to `fm_query_server.exe`.")
+@click.option("--output", "-o", type=click.Path(), default=None, help="Output CSV (default: `<dataset>.evidence.csv`).")
+@click.option("--window", type=int, default=100, help="Maximal subject-object distance (characters) to co-occur.")
+@click.option("--max_locations", type=int, default=1000, help="Mentions per shard checked before sampling evenly.")
+@click.option("--jobs", "-j", type=int, default=16, help="Number of shard groups queried in parallel.")
+@click.option("--worker_memory", type=float, default=None, help="Memory budget per server worker in GiB.")
+def evidence(
+    fm_index_dir: str,
+    config_file: str,
+    server: str,
+    output: Optional[str],
+    window: int,
+    max_locations: int,
+    jobs: int,
+    worker_memory: Optional[float],
+):
+    """Add forward/backward phrase and co-occurrence counts from the FM-index to a triple dataset.
+
+    The phrasings are rendered with the statement templates of the configuration file (question templates are
+    rejected, since questions are hardly ever stated in running text); `factprobe analyse` reports
+    their means per frequency range when run on the output CSV.
+    """
+    import pandas as pd
+    from yacs.config import CfgNode
+    from factprobe.evidence import attach_evidence
+    from factprobe.probe import FactProbe
+    from factprobe.utils.fmindex import FMIndexService
+    from factprobe.utils.io import load_file
+
+    config = CfgNode(load_file(config_file))
+    if config.template_type != "statement":
+        raise click.UsageError(
+            f"{config_file} uses {config.template_type} templates; evidence is counted for statements, "
+            "so pass the statement config of the relation."
+        )
+    probe = FactProbe(llm=None, **config)
+    df = pd.read_csv(config.dataset)
+    memory = int(worker_memory * 1024**3) if worker_memory else None
+    with FMIndexService(fm_index_dir, server, num_workers=jobs, worker_memory=memory) as service:
+        df = attach_evidence(df, probe, service, window=window, max_locations=max_locations)
+    output = output or str(Path(config.dataset).with_suffix(".evidence.csv"))
+    df.to_csv(output, index=False)
+    click.echo(f"Evidence counts of {len(df)} triples saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
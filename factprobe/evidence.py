@@ -0,0 +1,92 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ast
+import itertools
+import logging
+from typing import Dict, List, Tuple
+import pandas as pd
+from tqdm.auto import tqdm
+from factprobe.probe import FactProbe
+from factprobe.utils.analysis import EVIDENCE_COLUMNS
+from factprobe.utils.fmindex import FMIndexService
+
+logger = logging.getLogger(__name__)
+
+
+def surface_phrase(text: str) -> str:
+    """Strip the final punctuation of a rendered template so that it matches running text."""
+    return text.strip().rstrip(".?!").strip()
+
+
+def collect_surface_strings(
+    probe: FactProbe, df: pd.DataFrame
+) -> List[Tuple[List[str], List[str], List[Tuple[str, str]]]]:
+    """Render the forward and backward statements of every alias pair of every triple.
+
+    The strings are the user messages `FactProbe.probe` sends (without final punctuation), so evidence
+    is counted for exactly the phrasings that were probed.
+
+    Returns:
+        One `(forward phrases, backward phrases, alias pairs)` tuple per row of `df`.
+
+    Raises:
+        ValueError: If `probe` uses question templates, whose rendered questions hardly ever occur in running text.
+    """
+    if probe.template_type != "statement":
+        raise ValueError(f"Evidence requires statement templates, got template type: {probe.template_type}")
+    rows = []
+    for _, dp in tqdm(df.iterrows(), total=len(df), desc="Rendered triples"):
+        forward, backward, pairs = [], [], []
+        for s, o in itertools.product(ast.literal_eval(dp["subject_name"]), ast.literal_eval(dp["object_name"])):
+            forward.append(surface_phrase(probe.prompt_forward.surface((s, probe.relation_forward, o))))
+            backward.append(surface_phrase(probe.prompt_backward.surface((s, probe.relation_backward, o))))
+            pairs.append((s, o))
+        rows.append((forward, backward, pairs))
+    return rows
+
+
+def attach_evidence(
+    df: pd.DataFrame, probe: FactProbe, service: FMIndexService, window: int = 100, max_locations: int = 1000
+) -> pd.DataFrame:
+    """Count forward/backward phrasings and subject-object co-occurrences of every triple in the FM-index.
+
+    Counts are summed over all alias pairs of a triple, like `subject_count` and `object_count` are summed
+    over entity names. Identical strings across triples are only queried once.
+
+    Args:
+        df: Triple DataFrame with `subject_name` and `object_name` alias lists.
+        probe: `FactProbe` whose templates and relation phrases define the surface strings.
+        service: Running FM-index query service.
+        window: Maximal distance in characters between subject and object mentions to count as co-occurrence.
+        max_locations: Number of located mentions per shard above which co-occurrence is estimated from an even
+            sample of that many mentions.
+
+    Returns:
+        A copy of `df` with the columns in `EVIDENCE_COLUMNS` added.
+    """
+    rows = collect_surface_strings(probe, df)
+
+    phrases = [p for forward, backward, _ in rows for p in forward + backward]
+    pairs = [pair for _, _, row_pairs in rows for pair in row_pairs]
+    logger.info(f"Counting {len(set(phrases))} distinct phrases and {len(set(pairs))} distinct alias pairs")
+    phrase_counts: Dict[str, int] = dict(zip(phrases, service.count(phrases)))
+    pair_counts: Dict[Tuple[str, str], int] = dict(zip(pairs, service.cooccur(pairs, window, max_locations)))
+
+    df = df.copy()
+    forward_col, backward_col, cooccur_col = EVIDENCE_COLUMNS
+    df[forward_col] = [sum(phrase_counts[p] for p in forward) for forward, _, _ in rows]
+    df[backward_col] = [sum(phrase_counts[p] for p in backward) for _, backward, _ in rows]
+    df[cooccur_col] = [sum(pair_counts[pair] for pair in row_pairs) for _, _, row_pairs in rows]
+    return df
@@ -0,0 +1,124 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional
+from tqdm.auto import tqdm
+from factprobe.prompt import AffirmationPrompt, SemanticMatchPrompt
+from factprobe.utils.io import load_file, save_file
+
+if TYPE_CHECKING:
+    from vllm import LLM, SamplingParams
+
+logger = logging.getLogger(__name__)
+
+JUDGE_MODES = ["affirmation", "semantic_match"]
+
+
+class FactJudge:
+    """LLM-as-judge second pass over finished probing results.
+
+    Only outputs that failed the EM check are judged. Identical response texts (after stripping whitespace)
+    are judged once, and verdicts are kept in a persistent cache keyed by judge model, mode and reference
+    answer, so re-running on new result files only queries texts that have not been seen before.
+
+    Args:
+        llm: The judge model.
+        model_name: Name of the judge model, which keys its verdicts in the cache.
+        template_type: Template type of the probed results (`question` or `statement`), which sets the
+            reference answer (`Yes` or `True`) for the `semantic_match` mode.
+        mode: `affirmation` renders `AffirmationPrompt(response)`; `semantic_match` renders
+            `SemanticMatchPrompt(response, reference)`.
+        cache_path: Optional `.pkl` or `.json` file to load and save verdicts.
+        batch_size: Number of judge prompts per engine call; the cache is saved after every batch.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        model_name: str,
+        template_type: str,
+        mode: str = "affirmation",
+        cache_path: Optional[str] = None,
+        batch_size: int = 10000,
+    ):
+        assert template_type in ["question", "statement"], f"Invalid template type: {template_type}"
+        assert mode in JUDGE_MODES, f"Invalid judge mode: {mode}"
+        self.llm = llm
+        self.mode = mode
+        self.reference = {"question": "Yes", "statement": "True"}[template_type]
+        self.prompt = {"affirmation": AffirmationPrompt, "semantic_match": SemanticMatchPrompt}[mode]()
+        self.batch_size = batch_size
+        self.cache_path = cache_path
+        self.cache: Dict[str, Dict[str, bool]] = {}
+        if cache_path and os.path.exists(cache_path):
+            self.cache = load_file(cache_path)
+        # verdicts depend on the judge model, so cached ones are kept per model
+        self.cache_key = f"{model_name}|{mode}|{self.reference}"
+        self.verdicts = self.cache.setdefault(self.cache_key, {})
+
+    def render(self, response: str):
+        if self.mode == "affirmation":
+            return self.prompt.render(response)
+        return self.prompt.render(response, self.reference)
+
+    @staticmethod
+    def parse(text: str) -> bool:
+        return text.lower().strip().rstrip(".") == "yes"
+
+    def judge_texts(self, texts: List[str], sampling_params: SamplingParams | None = None) -> Dict[str, int]:
+        """Judge every text that is not in the cache yet, in batches."""
+        todo = [t for t in dict.fromkeys(texts) if t not in self.verdicts]
+        for start in tqdm(range(0, len(todo), self.batch_size), desc="Judged batches"):
+            batch = todo[start : start + self.batch_size]
+            outputs = self.llm.chat([self.render(t) for t in batch], sampling_params)
+            for text, output in zip(batch, outputs):
+                self.verdicts[text] = self.parse(output.outputs[0].text)
+            if self.cache_path:
+                save_file(self.cache, self.cache_path)
+        return {"distinct": len(set(texts)), "judged": len(todo)}
+
+    def judge(self, results: List[Dict], sampling_params: SamplingParams | None = None) -> Dict[str, int]:
+        """Add an `answer_judge` list next to `answer_em` in every entry of the given results.
+
+        `answer_judge` is `True` where the output passed the EM check or the judge affirmed it. Several result
+        dicts (e.g. both frequency settings of a relation) can be judged together to share deduplication.
+        """
+        failed = []
+        n_outputs = 0
+        for result in results:
+            for direction in ["forward", "backward"]:
+                for entry in result[direction].values():
+                    n_outputs += len(entry["text"])
+                    failed.extend(t.strip() for t, em in zip(entry["text"], entry["answer_em"]) if not em)
+
+        stats = {"outputs": n_outputs, "failed_em": len(failed), **self.judge_texts(failed, sampling_params)}
+
+        affirmed = 0
+        for result in results:
+            for direction in ["forward", "backward"]:
+                for entry in result[direction].values():
+                    entry["answer_judge"] = [
+                        em or self.verdicts[t.strip()] for t, em in zip(entry["text"], entry["answer_em"])
+                    ]
+                    affirmed += sum(j and not em for j, em in zip(entry["answer_judge"], entry["answer_em"]))
+        stats["affirmed"] = affirmed
+        logger.info(
+            f"[judge][{self.mode}] {stats['failed_em']} / {stats['outputs']} outputs failed EM, "
+            f"{stats['distinct']} distinct texts, {stats['judged']} sent to the judge, {affirmed} outputs affirmed"
+        )
+        return stats
@@ -0,0 +1,196 @@
+# Copyright 2025 Yuan He, Bailan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import os
+import logging
+import pandas as pd
+from typing import Optional
+from textwrap import dedent
+from yacs.config import CfgNode
+from vllm import LLM, SamplingParams
+from factprobe.pretokenize import ChatPretokenizer
+from factprobe.probe import FactProbe
+from factprobe.sampling import SequentialSampler
+from factprobe.utils.analysis import DIRECTION_HIGH2LOW, DIRECTION_LOW2HIGH, freq_dict_from_triple_df
+from factprobe.utils.io import save_file, load_file, create_path
+from factprobe.utils.metrics import NullMetrics, ProbeMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def batch_iter(df: pd.DataFrame, batch_size: int):
+    """Yields batches of a DataFrame."""
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start : start + batch_size]
+
+
+def sample_iter(sampler: SequentialSampler, results: dict):
+    """Yields rounds of a `SequentialSampler` until every frequency bucket has stopped.
+
+    `results` is updated in place by the caller between rounds and fed back to the sampler.
+    """
+    sampler.update(results)
+    while not sampler.done:
+        batch = sampler.next_round()
+        if batch.empty:
+            break
+        yield batch
+        sampler.update(results)
+
+
+def run_probe(
+    config_file: str,
+    model: Optional[str] = None,
+    run_all: bool = False,
+    run_test: bool = False,
+    metrics_dir: Optional[str] = None,
+    profile_stage: Optional[str] = None,
+    sample: bool = False,
+    pretokenize: bool = False,
+):
+    """Run the inference pipeline of `factprobe probe`."""
+
+    # Display command-line arguments
+    command_msg = f"""
+        config_file: {config_file}\n
+        model: {model}\n
+        run_all: {run_all}\n
+        run_test: {run_test}\n
+        metrics_dir: {metrics_dir}\n
+        profile_stage: {profile_stage}\n
+        sample: {sample}\n
+        pretokenize: {pretokenize}\n
+    """
+    logger.info(dedent(command_msg))
+
+    # 1. Load the configuration file
+    config = CfgNode(load_file(config_file))
+    if model:
+        config.model = model
+
+    # Instrumentation is opt-in; `NullMetrics` makes every hook a no-op
+    metrics = NullMetrics()
+    if metrics_dir:
+        run_name = f"{config.relation}_{config.model.replace('/', '_')}_{config.template_type}"
+        labels = {"relation": config.relation, "model": config.model, "template_type": config.template_type}
+        metrics = ProbeMetrics(metrics_dir, run_name, labels=labels, profile_stage=profile_stage)
+        logger.info(f"Writing metrics to: {metrics.jsonl_path}, {metrics.prom_path}")
+    elif profile_stage:
+        raise ValueError("Profiling a stage requires a metrics directory.")
+
+    # 2. Load and preprocess the dataset
+    with metrics.stage("load"):
+        df = pd.read_csv(config.dataset, nrows=100 if run_test else None)
+
+    if sample:
+        # bucket membership follows `analyse_results_all_freqs` rather than `count_high`/`count_low`
+        data_dict = {DIRECTION_HIGH2LOW: df, DIRECTION_LOW2HIGH: df}
+        freq_dict = freq_dict_from_triple_df(df)
+    elif not run_all:
+        data_dict = {
+            "high2low": df[(df["subject_count"] >= config.count_high) & (df["object_count"] <= config.count_low)],
+            "low2high": df[(df["subject_count"] <= config.count_low) & (df["object_count"] >= config.count_high)],
+        }
+    else:
+        data_dict = {"all": df}
+
+    # 3. Initialize the model and probe
+    trust_remote_code = config.get("trust_remote_code", False)
+    pretokenizer = None
+    with metrics.stage("load"):
+        llm = LLM(model=config.model, trust_remote_code=trust_remote_code)  # dtype="half"
+        probe = FactProbe(llm=llm, **config)
+        # Optionally apply the chat template in a process pool and pass token ids to the engine
+        if pretokenize:
+            pretokenizer = ChatPretokenizer(
+                config.model,
+                num_workers=config.get("pretokenize_workers", 8),
+                cache_dir=config.get("token_cache_dir", None),
+                trust_remote_code=trust_remote_code,
+            )
+    metrics.end_batch(freq_setting=None, batch=None)
+    sampling_params = SamplingParams(logprobs=10, temperature=0.0)  # temperature=0.0 means greedy decoding
+
+    # 4. Run inference with batched data
+    # Set up the output directory
+    base_path = os.path.join("experiments", config.relation, config.model)
+    create_path(base_path)
+
+    # the pretokenizer's process pool is shut down even if a batch fails
+    with pretokenizer or contextlib.nullcontext():
+        for freq_setting, data in data_dict.items():
+            logger.info(
+                f"Running inference: relation={config.relation}, type={config.template_type}, freq={freq_setting}"
+            )
+
+            # Construct file name
+            file_name = f"{config.relation}_{freq_setting}_{config.template_type}.pkl"
+            if not run_all:
+                file_name = f"{config.relation}_h={config.count_high}_l={config.count_low}_{freq_setting}_{config.template_type}.pkl"
+            if sample:
+                file_name = f"{config.relation}_{freq_setting}_sampled_{config.template_type}.pkl"
+            file_path = os.path.join(base_path, file_name)
+
+            # Load existing results if available
+            results = {"forward": {}, "backward": {}}
+            if os.path.exists(file_path):
+                with metrics.stage("load"):
+                    results = load_file(file_path)
+
+            if sample:
+                sampler = SequentialSampler(
+                    data,
+                    freq_dict,
+                    freq_setting,
+                    round_size=config.get("sample_round_size", 200),
+                    budget=config.get("sample_budget", 2000),
+                    alpha=config.get("sample_alpha", 0.05),
+                    ci_width=config.get("sample_ci_width", None),
+                    min_discordant=config.get("sample_min_discordant", 10),
+                    seed=config.get("sample_seed", 42),
+                )
+                batches = sample_iter(sampler, results)
+            else:
+                batches = batch_iter(data, config.batch_size)
+
+            for batch_idx, batch in enumerate(batches):
+                batch_keys = set(map(tuple, batch[["subject", "object"]].values.tolist()))
+
+                # Skip batch if all pairs already computed
+                if results["forward"] and batch_keys <= set(results["forward"].keys()):
+                    metrics.count("resumed_triples", len(batch))
+                    continue
+
+                # Run inference and update results
+                batch_results = probe.probe(batch, sampling_params, metrics=metrics, pretokenizer=pretokenizer)
+                results["forward"].update(batch_results["forward"])
+                results["backward"].update(batch_results["backward"])
+                with metrics.stage("checkpoint"):
+                    save_file(results, file_path)  # Save intermediate results
+                metrics.end_batch(freq_setting=freq_setting, batch=batch_idx)
+
+            # Save final results
+            save_file(results, file_path)
+            logger.info(f"Results saved: {file_path}")
+
+            if sample:
+                summary_path = file_path.replace(".pkl", ".sampling.json")
+                save_file({"rounds": sampler.rounds, "buckets": sampler.summary()}, summary_path)
+                for name, stats in sampler.summary().items():
+                    logger.info(
+                        f"[{freq_setting}][{name}] n={stats['total']} p={stats['p_value']:.4g} "
+                        f"ci={stats['diff_ci']} stop={stats['stop_reason']}"
+                    )
+                logger.info(f"Sampling summary saved: {summary_path}")
@@ -0,0 +1,267 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Conversation = List[Dict[str, str]]
+
+# Stands in for the user message when rendering the chat template around it
+SENTINEL = "\x00FACTPROBE_USER_MESSAGE\x00"
+
+# Tokenizer of the current pool worker, loaded once by `_init_worker`
+_worker_tokenizer = None
+
+
+def _load_tokenizer(tokenizer_name: str, trust_remote_code: bool = False):
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(tokenizer_name, trust_remote_code=trust_remote_code)
+
+
+def _init_worker(tokenizer_name: str, trust_remote_code: bool):
+    global _worker_tokenizer
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"  # parallelism comes from the pool
+    _worker_tokenizer = _load_tokenizer(tokenizer_name, trust_remote_code)
+
+
+def _encode_texts(texts: List[str]) -> List[List[int]]:
+    return _worker_tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+
+def template_ids(tokenizer, conversation: Conversation) -> List[int]:
+    """Token ids of a conversation with the generation prompt appended, as `LLM.chat` would build them."""
+    ids = tokenizer.apply_chat_template(conversation, add_generation_prompt=True, tokenize=True)
+    # recent `transformers` versions return a `BatchEncoding` instead of a list
+    return list(ids["input_ids"]) if isinstance(ids, Mapping) else list(ids)
+
+
+def _apply_template(conversations: List[Conversation]) -> List[List[int]]:
+    return [template_ids(_worker_tokenizer, c) for c in conversations]
+
+
+# Init kwargs that only say where or how a tokenizer was loaded, not how it tokenizes
+_LOADING_KWARGS = {
+    "name_or_path",
+    "is_local",
+    "local_files_only",
+    "cache_dir",
+    "revision",
+    "token",
+    "use_auth_token",
+    "trust_remote_code",
+    "_commit_hash",
+    "_from_auto",
+}
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of everything that determines the token ids of a chat prompt.
+
+    Covers the vocabulary, special tokens, chat template and tokenizer class, the full tokenization pipeline of
+    fast tokenizers (normalizer, pre-tokenizer, model and post-processor) or the SentencePiece model of slow ones,
+    and the init kwargs (e.g. `legacy`, `add_prefix_space`) apart from where the tokenizer was loaded from. Models
+    that share a tokenizer (e.g. sizes of one model family) get the same fingerprint.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    h.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode("utf-8"))
+    h.update((tokenizer.chat_template or "").encode("utf-8"))
+    h.update(type(tokenizer).__name__.encode("utf-8"))
+    if getattr(tokenizer, "is_fast", False):
+        h.update(tokenizer.backend_tokenizer.to_str().encode("utf-8"))
+    elif hasattr(tokenizer, "sp_model"):
+        h.update(tokenizer.sp_model.serialized_model_proto())
+    init_kwargs = {
+        k: v for k, v in tokenizer.init_kwargs.items() if k not in _LOADING_KWARGS and not k.endswith("_file")
+    }
+    h.update(json.dumps(init_kwargs, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ChatPretokenizer:
+    """Apply the chat template and tokenize prompts ahead of the engine call.
+
+    `LLM.chat` renders and tokenizes every conversation serially on the driver. For `[system, user]`
+    conversations, this class renders the template once per system message around a sentinel user message,
+    tokenizes the resulting prefix once and only encodes `user message + suffix` per prompt, in batches spread
+    over a process pool. `verify` prompts spread over every call are checked against full template
+    tokenization; on any mismatch (e.g. a template that merges tokens across the boundary or edits the user
+    message) that system message falls back to full template tokenization in the pool.
+
+    Token ids can be cached on disk under `cache_dir`, in one SQLite file per tokenizer fingerprint, so runs of
+    models sharing a tokenizer reuse them. Ids are stored as packed 32-bit integers and every call only reads the
+    prompts it needs, so the cache can grow across relations and models without being held in memory. `verify`
+    cache hits per call are checked against full template tokenization as well; on any mismatch the cache is
+    ignored for the rest of the run and the prompts are tokenized again, replacing the stale entries.
+
+    Args:
+        tokenizer_name: Name or path of the Hugging Face tokenizer (usually the model name).
+        num_workers: Number of tokenizer processes; `0` tokenizes in the calling process.
+        cache_dir: Optional directory of the persistent token cache.
+        trust_remote_code: Whether to run custom tokenizer code from the model repository (as for `vllm.LLM`).
+        verify: Number of new prompts and of cache hits per call checked against full template tokenization.
+        chunk_size: Number of prompts per pool task.
+    """
+
+    def __init__(
+        self,
+        tokenizer_name: str,
+        num_workers: int = 8,
+        cache_dir: Optional[str | Path] = None,
+        verify: int = 16,
+        chunk_size: int = 1000,
+        trust_remote_code: bool = False,
+    ):
+        self.tokenizer_name = tokenizer_name
+        self.trust_remote_code = trust_remote_code
+        self.tokenizer = _load_tokenizer(tokenizer_name, trust_remote_code)
+        self.num_workers = num_workers
+        self.verify = verify
+        self.chunk_size = chunk_size
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # system message -> (prefix ids, suffix text), or None if the split does not reproduce the template
+        self.templates: Dict[str, Optional[Tuple[List[int], str]]] = {}
+
+        self.cache: Optional[sqlite3.Connection] = None
+        # cleared once a cache hit differs from full template tokenization
+        self.cache_valid = True
+        if cache_dir is not None:
+            cache_path = Path(cache_dir) / f"{tokenizer_fingerprint(self.tokenizer)[:16]}.sqlite"
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # runs sharing the cache may write concurrently
+            self.cache = sqlite3.connect(cache_path, timeout=60)
+            self.cache.execute("CREATE TABLE IF NOT EXISTS prompts (key TEXT PRIMARY KEY, ids BLOB NOT NULL)")
+            logger.info(f"Using token cache: {cache_path}")
+
+    def _map(self, fn, items: list) -> list:
+        """Apply a worker function to chunks of `items` and concatenate the results in order."""
+        chunks = [items[start : start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+        if self.num_workers <= 0 or len(chunks) <= 1:
+            global _worker_tokenizer
+            _worker_tokenizer = self.tokenizer
+            return [ids for chunk in chunks for ids in fn(chunk)]
+        if self.pool is None:
+            # spawn: forking a driver holding CUDA contexts and tokenizer threads is unsafe
+            context = multiprocessing.get_context("spawn")
+            self.pool = ProcessPoolExecutor(
+                self.num_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.tokenizer_name, self.trust_remote_code),
+            )
+        return [ids for result in self.pool.map(fn, chunks) for ids in result]
+
+    def _template(self, system: str) -> Optional[Tuple[List[int], str]]:
+        """Render the template around the sentinel and tokenize the shared prefix once."""
+        if system not in self.templates:
+            conversation = [{"role": "system", "content": system}, {"role": "user", "content": SENTINEL}]
+            text = self.tokenizer.apply_chat_template(conversation, add_generation_prompt=True, tokenize=False)
+            if text.count(SENTINEL) != 1:
+                self.templates[system] = None
+            else:
+                prefix, suffix = text.split(SENTINEL)
+                self.templates[system] = (self.tokenizer.encode(prefix, add_special_tokens=False), suffix)
+        return self.templates[system]
+
+    @staticmethod
+    def _key(conversation: Conversation) -> str:
+        return hashlib.sha1(json.dumps(conversation, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _cached(self, keys: List[str]) -> Dict[str, List[int]]:
+        """Look up the token ids of `keys` in the persistent cache."""
+        found = {}
+        if self.cache is None or not self.cache_valid:
+            return found
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):  # stay below SQLite's limit of query parameters
+            batch = unique[start : start + 500]
+            query = f"SELECT key, ids FROM prompts WHERE key IN ({','.join('?' * len(batch))})"
+            for key, blob in self.cache.execute(query, batch):
+                found[key] = array("i", blob).tolist()
+        return found
+
+    def _sample(self, n: int) -> range:
+        """Indices of at most `verify` items spread over `n` items."""
+        step = max(n // max(self.verify, 1), 1)
+        return range(0, n, step)[: self.verify]
+
+    def tokenize(self, conversations: List[Conversation]) -> List[List[int]]:
+        """Token ids of every conversation with the generation prompt appended, aligned with `conversations`."""
+        keys = [self._key(c) for c in conversations]
+        unique = dict(zip(keys, conversations))
+        cached = self._cached(keys)
+        hits = list(cached)
+        if any(cached[hits[i]] != template_ids(self.tokenizer, unique[hits[i]]) for i in self._sample(len(hits))):
+            logger.warning("Cached token ids differ from the chat template; ignoring the token cache")
+            self.cache_valid = False
+            cached = {}
+        todo = [(k, c) for k, c in unique.items() if k not in cached]
+        new: Dict[str, List[int]] = {}
+
+        # group by system message; anything that is not a [system, user] conversation is templated in full
+        groups: Dict[Optional[str], List[Tuple[str, Conversation]]] = {}
+        for k, c in todo:
+            is_pair = len(c) == 2 and c[0]["role"] == "system" and c[1]["role"] == "user"
+            groups.setdefault(c[0]["content"] if is_pair else None, []).append((k, c))
+
+        for system, items in groups.items():
+            template = self._template(system) if system is not None else None
+            if template is not None:
+                prefix_ids, suffix = template
+                encoded = self._map(_encode_texts, [c[1]["content"] + suffix for _, c in items])
+                ids_list = [prefix_ids + ids for ids in encoded]
+                if any(ids_list[i] != template_ids(self.tokenizer, items[i][1]) for i in self._sample(len(items))):
+                    logger.warning("Prefix tokenization differs from the chat template; tokenizing in full instead")
+                    self.templates[system] = None
+                    template = None
+            if template is None:
+                ids_list = self._map(_apply_template, [c for _, c in items])
+            new.update((k, ids) for (k, _), ids in zip(items, ids_list))
+
+        if new and self.cache is not None:
+            with self.cache:
+                self.cache.executemany(
+                    "INSERT OR REPLACE INTO prompts VALUES (?, ?)",
+                    ((k, array("i", ids).tobytes()) for k, ids in new.items()),
+                )
+        return [new[k] if k in new else cached[k] for k in keys]
+
+    def __call__(self, conversations: List[Conversation]) -> List[Dict[str, List[int]]]:
+        """Token prompts (`{"prompt_token_ids": ...}`) for `LLM.generate`."""
+        return [{"prompt_token_ids": ids} for ids in self.tokenize(conversations)]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -12,12 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import annotations
+
 import pandas as pd
 import itertools
 import random
+from typing import TYPE_CHECKING
 from tqdm.auto import tqdm
-from vllm import LLM, SamplingParams
 from factprobe.prompt import QuestionPrompt, StatementPrompt
+from factprobe.utils.metrics import NullMetrics
+
+if TYPE_CHECKING:
+    # only needed for annotations; keeps `FactProbe` usable with a stub engine on CPU-only machines
+    from vllm import LLM, SamplingParams
+    from factprobe.pretokenize import ChatPretokenizer
 
 
 class FactProbe:
@@ -41,55 +49,70 @@ class FactProbe:
         self.relation_backward = relation_backward
         self.correct = {"question": "yes", "statement": "true"}[self.template_type]
 
-    def probe(self, data: pd.DataFrame, sampling_params: SamplingParams | None = None):
+    def probe(
+        self,
+        data: pd.DataFrame,
+        sampling_params: SamplingParams | None = None,
+        metrics: NullMetrics | None = None,
+        pretokenizer: ChatPretokenizer | None = None,
+    ):
+        metrics = metrics or NullMetrics()
         inputs_forward = []
         inputs_backward = []
         keys = []
         # collect and format inputs
-        for _, dp in tqdm(data.iterrows(), total=len(data), desc="Preprocessed triples"):
-            for s, o in itertools.product(eval(dp["subject_name"]), eval(dp["object_name"])):
-                keys.append((dp["subject"], dp["object"]))
-                inputs_forward.append(self.prompt_forward.render((s, self.relation_forward, o)))
-                inputs_backward.append(self.prompt_backward.render((s, self.relation_backward, o)))
+        with metrics.stage("render"):
+            for _, dp in tqdm(data.iterrows(), total=len(data), desc="Preprocessed triples"):
+                for s, o in itertools.product(eval(dp["subject_name"]), eval(dp["object_name"])):
+                    keys.append((dp["subject"], dp["object"]))
+                    inputs_forward.append(self.prompt_forward.render((s, self.relation_forward, o)))
+                    inputs_backward.append(self.prompt_backward.render((s, self.relation_backward, o)))
+        metrics.count("triples", len(data))
         example_idx = random.randint(0, (len(inputs_forward) - 1))
         print(f"Example forward inputs [{example_idx}]:\n", inputs_forward[example_idx])
         print(f"Example backward inputs [{example_idx}]:\n", inputs_backward[example_idx])
 
+        # token-id prompts skip template rendering and tokenization on the driver
+        if pretokenizer is not None:
+            with metrics.stage("tokenize"):
+                prompts_forward = pretokenizer(inputs_forward)
+                prompts_backward = pretokenizer(inputs_backward)
+
         # compute forward outputs
-        outputs_forward = self.llm.chat(inputs_forward, sampling_params)
-        results_forward = dict()
-        for output, k in zip(outputs_forward, keys):
-            entry = results_forward.setdefault(k, {"text": [], "answer_em": [], "answer_in": [], "logprobs": []})
-            entry["text"].append(output.outputs[0].text)
-            entry["answer_em"].append(self.correct == output.outputs[0].text.lower().strip())
-            entry["answer_in"].append(self.correct in output.outputs[0].text.lower().strip())
-            entry["logprobs"].append({k: v.__dict__ for k, v in output.outputs[0].logprobs[0].items()})
-        count_forward_em = 0
-        count_forward_in = 0
-        for _, v in results_forward.items():
-            count_forward_em += int(any(v["answer_em"]))
-            count_forward_in += int(any(v["answer_in"]))
+        with metrics.stage("engine_forward"):
+            if pretokenizer is not None:
+                outputs_forward = self.llm.generate(prompts_forward, sampling_params)
+            else:
+                outputs_forward = self.llm.chat(inputs_forward, sampling_params)
+        with metrics.stage("postprocess"):
+            metrics.record_outputs(outputs_forward)
+            results_forward = self.collect_results(outputs_forward, keys)
+        count_forward_em = sum(int(any(v["answer_em"])) for v in results_forward.values())
 
-        # compute backwardward outputs
-        outputs_backward = self.llm.chat(inputs_backward, sampling_params)
-        results_backward = dict()
-        for output, k in zip(outputs_backward, keys):
-            entry = results_backward.setdefault(k, {"text": [], "answer_em": [], "answer_in": [], "logprobs": []})
-            entry["text"].append(output.outputs[0].text)
-            entry["answer_em"].append(self.correct == output.outputs[0].text.lower().strip())
-            entry["answer_in"].append(self.correct in output.outputs[0].text.lower().strip())
-            entry["logprobs"].append({k: v.__dict__ for k, v in output.outputs[0].logprobs[0].items()})
-        count_backward_em = 0
-        count_backward_in = 0
-        for _, v in results_backward.items():
-            count_backward_em += int(any(v["answer_em"]))
-            count_backward_in += int(any(v["answer_in"]))
+        # compute backward outputs
+        with metrics.stage("engine_backward"):
+            if pretokenizer is not None:
+                outputs_backward = self.llm.generate(prompts_backward, sampling_params)
+            else:
+                outputs_backward = self.llm.chat(inputs_backward, sampling_params)
+        with metrics.stage("postprocess"):
+            metrics.record_outputs(outputs_backward)
+            results_backward = self.collect_results(outputs_backward, keys)
+        count_backward_em = sum(int(any(v["answer_em"])) for v in results_backward.values())
 
         print(
             f"[{self.template_type}][EM] {count_forward_em}-{count_backward_em} / {len(data)} ({len(inputs_forward)} its)"
         )
-        # print(
-        #     f"[{self.template_type}][IN] {count_forward_in}-{count_backward_in} / {len(data)} ({len(inputs_forward)})"
-        # )
 
         return {"forward": results_forward, "backward": results_backward}
+
+    def collect_results(self, outputs: list, keys: list):
+        """Group engine outputs by triple key and check them against the correct answer."""
+        results = dict()
+        for output, k in zip(outputs, keys):
+            entry = results.setdefault(k, {"text": [], "answer_em": [], "answer_in": [], "logprobs": []})
+            entry["text"].append(output.outputs[0].text)
+            entry["answer_em"].append(self.correct == output.outputs[0].text.lower().strip())
+            entry["answer_in"].append(self.correct in output.outputs[0].text.lower().strip())
+            entry["logprobs"].append({k: v.__dict__ for k, v in output.outputs[0].logprobs[0].items()})
+        return results
@@ -28,13 +28,13 @@ class QuestionPrompt(BaseModel):
             raise ValueError(f"Triple template must include {placeholders}. Missing: {missing_placeholders}")
         return template
 
+    def surface(self, triplet: Tuple[str, str, str]):
+        s, r, o = triplet
+        return self.template.format(subject=s, predicate=r, object=o)
+
     def render(self, triplet: Tuple[str, str, str]):
         system_input = {"role": "system", "content": self.instruction}
-        s, r, o = triplet
-        user_input = {
-            "role": "user",
-            "content": self.template.format(subject=s, predicate=r, object=o),
-        }
+        user_input = {"role": "user", "content": self.surface(triplet)}
         return [system_input, user_input]
 
 
@@ -50,13 +50,13 @@ class StatementPrompt(BaseModel):
             raise ValueError(f"Triple template must include {placeholders}. Missing: {missing_placeholders}")
         return template
 
+    def surface(self, triplet: Tuple[str, str, str]):
+        s, r, o = triplet
+        return self.template.format(subject=s, predicate=r, object=o)
+
     def render(self, triplet: Tuple[str, str, str]):
         system_input = {"role": "system", "content": self.instruction}
-        s, r, o = triplet
-        user_input = {
-            "role": "user",
-            "content": self.template.format(subject=s, predicate=r, object=o),
-        }
+        user_input = {"role": "user", "content": self.surface(triplet)}
         return [system_input, user_input]
 
 
@@ -0,0 +1,199 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from scipy.stats import norm
+from factprobe.utils.analysis import LOW_FREQ_RANGES, FreqDict, TripleKey, freq_condition, freq_range_name
+from factprobe.utils.stats import mcnemar_p
+
+# Reasons for a bucket to stop sampling
+STOP_SIGNIFICANT = "significant"
+STOP_CI_WIDTH = "ci_width"
+STOP_BUDGET = "budget"
+STOP_EXHAUSTED = "exhausted"
+
+
+class FreqBucket:
+    """Sampling state and paired counts of one low-frequency range."""
+
+    def __init__(self, name: str, keys: List[TripleKey]):
+        self.name = name
+        self.pool = keys
+        self.drawn = 0
+        self.total = 0
+        self.forward_correct = 0
+        self.backward_correct = 0
+        self.n10 = 0
+        self.n01 = 0
+        self.stop_reason: Optional[str] = None
+
+    @property
+    def p_value(self) -> float:
+        return mcnemar_p(self.n10, self.n01)
+
+    def diff_ci(self, confidence: float) -> Tuple[float, float]:
+        """Agresti-Min interval of the paired accuracy difference (forward - backward).
+
+        This is the Wald interval after adding 0.5 to each cell of the paired 2x2 table, which keeps it from
+        collapsing to zero width when there are no discordant pairs.
+        """
+        if self.total == 0:
+            return (-1.0, 1.0)
+        n = self.total + 2
+        n10, n01 = self.n10 + 0.5, self.n01 + 0.5
+        diff = (n10 - n01) / n
+        var = max((n10 + n01) / n - diff**2, 0.0) / n
+        half_width = norm.ppf(0.5 + confidence / 2) * math.sqrt(var)
+        return (max(diff - half_width, -1.0), min(diff + half_width, 1.0))
+
+    def summary(self, confidence: float) -> Dict[str, float | int | str | None]:
+        ci_low, ci_high = self.diff_ci(confidence)
+        return {
+            "total": self.total,
+            "forward_acc": round(self.forward_correct / self.total, 3) if self.total else 0,
+            "backward_acc": round(self.backward_correct / self.total, 3) if self.total else 0,
+            "n10": self.n10,
+            "n01": self.n01,
+            "p_value": float(self.p_value),
+            "diff_ci": [round(ci_low, 4), round(ci_high, 4)],
+            "remaining": len(self.pool),
+            "stop_reason": self.stop_reason,
+        }
+
+
+class SequentialSampler:
+    """Frequency-stratified sampling of triples with sequential stopping per frequency bucket.
+
+    Triples of one direction (`high2low` or `low2high`) are split into the low-frequency ranges of
+    `analyse_results_all_freqs`. Each round draws up to `round_size` unseen triples from every active bucket;
+    after their results are passed to `update`, a bucket stops once McNemar's test is significant, the
+    confidence interval of the forward-backward accuracy difference is narrower than `ci_width` (once at least
+    `min_discordant` discordant pairs have been seen), its `budget` is spent, or it has no triples left.
+
+    Because significance is checked after every round, `alpha` is split evenly (Bonferroni) over the maximum
+    number of rounds `ceil(budget / round_size)` so that early stopping does not inflate the false positive rate.
+
+    Args:
+        df: Triple DataFrame with `subject`, `object`, `subject_count` and `object_count` columns.
+        freq_dict: Dictionary mapping entities to their frequencies.
+        direction: `high2low` or `low2high`.
+        round_size: Number of triples drawn per bucket and round.
+        budget: Maximum number of triples probed per bucket.
+        alpha: Overall significance level of McNemar's test.
+        ci_width: Optional target width of the accuracy-difference interval.
+        min_discordant: Minimum number of discordant pairs before the `ci_width` criterion can stop a bucket.
+        confidence: Confidence level of the interval.
+        seed: Random seed of the draws.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        freq_dict: FreqDict,
+        direction: str,
+        round_size: int = 200,
+        budget: int = 2000,
+        alpha: float = 0.05,
+        ci_width: Optional[float] = None,
+        min_discordant: int = 10,
+        confidence: float = 0.95,
+        seed: int = 42,
+    ):
+        self.df = df.drop_duplicates(subset=["subject", "object"]).set_index(["subject", "object"], drop=False)
+        self.direction = direction
+        self.round_size = round_size
+        self.budget = budget
+        self.alpha_per_round = alpha / math.ceil(budget / round_size)
+        self.ci_width = ci_width
+        self.min_discordant = min_discordant
+        self.confidence = confidence
+        self.rounds = 0
+
+        rng = random.Random(seed)
+        self.buckets: List[FreqBucket] = []
+        self.key_to_bucket: Dict[TripleKey, FreqBucket] = {}
+        keys = list(self.df.index)
+        for ls, le in LOW_FREQ_RANGES:
+            cond = freq_condition(freq_dict, direction, ls, le)
+            # ranges share their boundaries; a triple belongs to the first range that contains it
+            bucket_keys = [k for k in keys if k not in self.key_to_bucket and cond(*k)]
+            rng.shuffle(bucket_keys)
+            bucket = FreqBucket(freq_range_name(ls, le), bucket_keys)
+            self.buckets.append(bucket)
+            self.key_to_bucket.update((k, bucket) for k in bucket_keys)
+        self.counted = set()
+
+    @property
+    def active(self) -> List[FreqBucket]:
+        return [b for b in self.buckets if b.stop_reason is None]
+
+    @property
+    def done(self) -> bool:
+        return not self.active
+
+    def next_round(self) -> pd.DataFrame:
+        """Draw the next round of unseen triples from all active buckets."""
+        keys = []
+        for bucket in self.active:
+            n = min(self.round_size, self.budget - bucket.drawn)
+            drawn = []
+            while bucket.pool and len(drawn) < n:
+                k = bucket.pool.pop()
+                if k not in self.counted:
+                    drawn.append(k)
+            bucket.drawn += len(drawn)
+            keys.extend(drawn)
+        self.rounds += 1
+        return self.df.loc[keys].reset_index(drop=True)
+
+    def update(self, results: Dict[str, Dict[TripleKey, Dict]], answer_key: str = "answer_em"):
+        """Add the paired outcomes of newly probed triples and stop buckets that have reached a criterion.
+
+        Keys that were already counted are ignored, so the full (e.g. resumed) results dict can be passed.
+        """
+        for k in results["forward"].keys():
+            bucket = self.key_to_bucket.get(k)
+            if bucket is None or k in self.counted:
+                continue
+            self.counted.add(k)
+            em_forward = int(any(results["forward"][k][answer_key]))
+            em_backward = int(any(results["backward"][k][answer_key]))
+            bucket.total += 1
+            bucket.forward_correct += em_forward
+            bucket.backward_correct += em_backward
+            bucket.n10 += int(em_forward == 1 and em_backward == 0)
+            bucket.n01 += int(em_forward == 0 and em_backward == 1)
+            if bucket.drawn < bucket.total:  # triples from resumed results count towards the budget
+                bucket.drawn = bucket.total
+
+        for bucket in self.active:
+            ci_low, ci_high = bucket.diff_ci(self.confidence)
+            if bucket.total > 0 and bucket.p_value < self.alpha_per_round:
+                bucket.stop_reason = STOP_SIGNIFICANT
+            elif (
+                self.ci_width is not None
+                and bucket.n10 + bucket.n01 >= self.min_discordant
+                and ci_high - ci_low <= self.ci_width
+            ):
+                bucket.stop_reason = STOP_CI_WIDTH
+            elif bucket.drawn >= self.budget:
+                bucket.stop_reason = STOP_BUDGET
+            elif not any(k not in self.counted for k in bucket.pool):
+                bucket.stop_reason = STOP_EXHAUSTED
+
+    def summary(self) -> Dict[str, Dict[str, float | int | str | None]]:
+        return {b.name: b.summary(self.confidence) for b in self.buckets}
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Callable, Dict, Tuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+import click
 import pandas as pd
+from .io import load_file, save_file
 from .stats import mcnemar_p
 
 # Constants
@@ -23,9 +26,16 @@ DIRECTION_LOW2HIGH = "low2high"
 DIRECTION_HIGH2HIGH = "high2high"
 VALID_DIRECTIONS = {DIRECTION_HIGH2LOW, DIRECTION_LOW2HIGH, DIRECTION_HIGH2HIGH}
 
+# Low-frequency ranges of the analysis tables
+LOW_FREQ_RANGES = [(0, 1000), (1000, 10000), (10000, 100000)]
+
+# Triple-level evidence columns added by `factprobe evidence`
+EVIDENCE_COLUMNS = ["forward_phrase_count", "backward_phrase_count", "cooccur_count"]
+
 # Type aliases
 FreqDict = Dict[str, int]
 TripleKey = Tuple[str, str]
+EvidenceDict = Dict[TripleKey, Dict[str, int]]
 
 
 def freq_dict_from_triple_df(triple_df: pd.DataFrame) -> FreqDict:
@@ -43,6 +53,22 @@ def freq_dict_from_triple_df(triple_df: pd.DataFrame) -> FreqDict:
     return freq_dict
 
 
+def evidence_dict_from_triple_df(triple_df: pd.DataFrame) -> EvidenceDict | None:
+    """
+    Extract the triple-level evidence counts from a triple DataFrame, or None if it has no evidence columns.
+    """
+    if not all(c in triple_df.columns for c in EVIDENCE_COLUMNS):
+        return None
+    rows = triple_df[["subject", "object", *EVIDENCE_COLUMNS]].itertuples(index=False)
+    return {(row[0], row[1]): dict(zip(EVIDENCE_COLUMNS, row[2:])) for row in rows}
+
+
+def freq_range_name(low_freq_start: int, low_freq_end: int) -> str:
+    """Name of a low-frequency range as used in the analysis tables, e.g. `1K-10K`."""
+    k = f"{low_freq_start}-{low_freq_end}"
+    return k.replace("100000", "100K").replace("10000", "10K").replace("1000", "1K")
+
+
 def freq_condition(
     freq_dict: FreqDict, direction: str, low_freq_start: int, low_freq_end: int
 ) -> Callable[[str, str], bool]:
@@ -78,6 +104,8 @@ def analyse_results_for_low_freq_range(
     direction: str,
     low_freq_start: int,
     low_freq_end: int,
+    answer_key: str = "answer_em",
+    evidence: EvidenceDict | None = None,
 ) -> Dict[str, float | int | str]:
     """Analyze results for a specific frequency range.
 
@@ -87,6 +115,8 @@ def analyse_results_for_low_freq_range(
         direction: Direction of analysis ('high2low', 'low2high', or 'high2high')
         low_freq_start: Lower bound for low frequency range
         low_freq_end: Upper bound for low frequency range
+        answer_key: Correctness list of each result entry to use ('answer_em', 'answer_in' or 'answer_judge')
+        evidence: Optional triple-level evidence counts to average over the range
 
     Returns:
         Dictionary containing analysis statistics including:
@@ -95,19 +125,28 @@ def analyse_results_for_low_freq_range(
         - backward_acc: Backward accuracy
         - diff_arrow: Visual indicator of performance difference
         - stat_sig: Statistical significance indicator
+        - <evidence column>_mean: Mean evidence count (only if `evidence` is given)
     """
+    if any(answer_key not in entry for d in ["forward", "backward"] for entry in results[d].values()):
+        hint = " Run `factprobe judge` on the results first." if answer_key == "answer_judge" else ""
+        raise click.UsageError(f"Results have no `{answer_key}` for every triple.{hint}")
+
     n10 = 0
     n01 = 0
     total = 0
     forward_correct = 0
     backward_correct = 0
+    evidence_sums = dict.fromkeys(EVIDENCE_COLUMNS, 0)
     freq_cond = freq_condition(freq_dict, direction, low_freq_start, low_freq_end)
 
     for s, o in results["forward"].keys():
         if freq_cond(s, o):
             total += 1
-            em_forward = int(any(results["forward"][(s, o)]["answer_em"]))
-            em_backward = int(any(results["backward"][(s, o)]["answer_em"]))
+            if evidence is not None:
+                for c in EVIDENCE_COLUMNS:
+                    evidence_sums[c] += evidence[(s, o)][c]
+            em_forward = int(any(results["forward"][(s, o)][answer_key]))
+            em_backward = int(any(results["backward"][(s, o)][answer_key]))
             forward_correct += em_forward
             backward_correct += em_backward
             if em_forward == 1 and em_backward == 0:
@@ -140,17 +179,25 @@ def analyse_results_for_low_freq_range(
     forward_acc = round(forward_correct / total, 3) if total > 0 else 0
     backward_acc = round(backward_correct / total, 3) if total > 0 else 0
 
-    return {
+    stats = {
         "total": total,
         "forward_acc": forward_acc,
         "backward_acc": backward_acc,
         "diff_arrow": diff_arrow,
         "stat_sig": stat_sig,
     }
+    if evidence is not None:
+        for c in EVIDENCE_COLUMNS:
+            stats[f"{c}_mean"] = round(evidence_sums[c] / total, 2) if total > 0 else 0
+    return stats
 
 
 def analyse_results_all_freqs(
-    results: Dict[str, Dict[TripleKey, Dict]], freq_dict: FreqDict, direction: str
+    results: Dict[str, Dict[TripleKey, Dict]],
+    freq_dict: FreqDict,
+    direction: str,
+    answer_key: str = "answer_em",
+    evidence: EvidenceDict | None = None,
 ) -> Dict[str, Dict[str, float | int | str]]:
     """Analyze results across all frequency ranges.
 
@@ -158,14 +205,62 @@ def analyse_results_all_freqs(
         results: Dictionary containing forward and backward results
         freq_dict: Dictionary mapping entities to their frequencies
         direction: Direction of analysis ('high2low', 'low2high', or 'high2high')
+        answer_key: Correctness list of each result entry to use ('answer_em', 'answer_in' or 'answer_judge')
+        evidence: Optional triple-level evidence counts to average over each range
 
     Returns:
         Dictionary mapping frequency ranges to their analysis statistics
     """
     stats = {}
 
-    for ls, le in [(0, 1000), (1000, 10000), (10000, 100000)]:
-        k = f"{ls}-{le}".replace("100000", "100K").replace("10000", "10K").replace("1000", "1K")
-        stats[k] = analyse_results_for_low_freq_range(results, freq_dict, direction, ls, le)
+    for ls, le in LOW_FREQ_RANGES:
+        k = freq_range_name(ls, le)
+        stats[k] = analyse_results_for_low_freq_range(results, freq_dict, direction, ls, le, answer_key, evidence)
 
     return stats
+
+
+def analyse_experiment(
+    results_path: str | Path,
+    triple_df_path: str | Path,
+    output_path: str | Path | None = None,
+    answer_key: str = "answer_em",
+) -> Dict[str, Any]:
+    """Analyze experiment results using a separate triple DataFrame.
+
+    Args:
+        results_path: Path to the .pkl file containing experiment results
+        triple_df_path: Path to the .csv file containing the triple DataFrame
+        output_path: Optional path to save the analysis results. If None,
+                    will save in the same directory as the input file.
+        answer_key: Correctness list of each result entry to use ('answer_em', 'answer_in' or 'answer_judge')
+
+    Returns:
+        Dictionary containing the analysis results
+    """
+    # Load the experiment results and triple DataFrame
+    results = load_file(results_path)
+    triple_df = pd.read_csv(triple_df_path)
+
+    # If output_path is not specified, save in the same directory
+    if output_path is None:
+        output_path = Path(results_path).with_suffix(".analysis.json")
+
+    # Extract frequency dictionary (and evidence counts, if present) from triple_df
+    freq_dict = freq_dict_from_triple_df(triple_df)
+    evidence = evidence_dict_from_triple_df(triple_df)
+
+    # Analyze results for different directions
+    analysis_results = {}
+    for direction in [DIRECTION_HIGH2LOW, DIRECTION_LOW2HIGH]:
+        analysis_results[direction] = analyse_results_all_freqs(results, freq_dict, direction, answer_key, evidence)
+    analysis_results[DIRECTION_HIGH2HIGH] = {
+        r"$\geq$100K": analyse_results_for_low_freq_range(
+            results, freq_dict, DIRECTION_HIGH2HIGH, -1, -1, answer_key, evidence
+        )
+    }
+
+    # Save the analysis results
+    save_file(analysis_results, output_path)
+
+    return analysis_results
@@ -0,0 +1,293 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FM_INDEX_SUFFIX = ".fm9"
+
+
+def find_shards(fm_index_dir: str | Path) -> List[str]:
+    """List all FM-index shards (`*.fm9`) under a directory, sorted by path.
+
+    Paths start with `fm_index_dir` as given (e.g. `./data/fm_index/...`), like the output of `find`.
+    """
+    root = Path(fm_index_dir)
+    return sorted(os.path.join(str(fm_index_dir), str(p.relative_to(root))) for p in root.rglob(f"*{FM_INDEX_SUFFIX}"))
+
+
+def query_shards(
+    fm_index_dir: str | Path,
+    entity_file: str | Path,
+    executable: str | Path,
+    output_file: str | Path,
+    jobs: int = 16,
+    retries: int = 3,
+) -> Dict[str, int]:
+    """Count entity names in every shard with `fm_get_freq` and sum the per-shard counts.
+
+    This is the Python equivalent of `data_index/find_query_in_fm.sh`: per-shard outputs are kept next to
+    `output_file` in `temp_output/`, and shards listed in `progress_file.txt` are skipped on re-runs. Like
+    `parallel --retries 3 --halt soon,fail=1`, a failing shard is retried and, if it still fails, no new shards
+    are started and no combined output is written.
+
+    Args:
+        fm_index_dir: Directory containing the `.fm9` shards.
+        entity_file: JSON file mapping entity IDs to `{"names": [...]}`.
+        executable: Path to the compiled `fm_get_freq.exe`.
+        output_file: Path of the combined JSON output.
+        jobs: Number of shards processed in parallel.
+        retries: Number of attempts per shard.
+
+    Returns:
+        Dictionary mapping entity IDs to their total counts.
+
+    Raises:
+        RuntimeError: If any shard failed in all attempts.
+    """
+    output_dir = Path(output_file).parent
+    temp_dir = output_dir / "temp_output"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    progress_file = output_dir / "progress_file.txt"
+    # the shell script records paths as printed by `find`, relative to where it was run
+    done = set()
+    if progress_file.exists():
+        done = {os.path.abspath(line) for line in progress_file.read_text().split("\n") if line}
+
+    shards = find_shards(fm_index_dir)
+    todo = [shard for shard in shards if os.path.abspath(shard) not in done]
+    logger.info(f"Querying {len(todo)} of {len(shards)} shards ({len(shards) - len(todo)} already processed)")
+
+    def run(shard: str):
+        shard_output = temp_dir / f"{os.path.basename(shard)}.json"
+        for attempt in range(1, retries + 1):
+            try:
+                subprocess.run(
+                    [str(executable), shard, str(entity_file), str(shard_output)], check=True, capture_output=True
+                )
+                return shard
+            except subprocess.CalledProcessError as e:
+                logger.warning(
+                    f"Attempt {attempt}/{retries} of {executable} with {shard} failed: "
+                    f"{e.stderr.decode(errors='replace').strip()}"
+                )
+                if attempt == retries:
+                    raise
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool, open(progress_file, "a") as progress:
+        futures = {pool.submit(run, shard): shard for shard in todo}
+        for i, future in enumerate(as_completed(futures), start=1):
+            shard = futures[future]
+            if future.cancelled():
+                continue
+            try:
+                future.result()
+            except subprocess.CalledProcessError:
+                logger.error(f"Error executing {executable} with {shard}; not starting further shards")
+                failed.append(shard)
+                # like `--halt soon,fail=1`: let running shards finish but start no new ones
+                for pending in futures:
+                    pending.cancel()
+                continue
+            progress.write(shard + "\n")
+            progress.flush()
+            logger.info(f"Processed {i}/{len(todo)} shards: {shard}")
+
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} shards failed after {retries} attempts (e.g. {failed[0]}); re-run to resume. "
+            f"Combined output was not written."
+        )
+
+    combined: Dict[str, int] = {}
+    for shard_output in temp_dir.glob("*.json"):
+        with open(shard_output) as f:
+            for entity_id, count in json.load(f).items():
+                combined[entity_id] = combined.get(entity_id, 0) + count
+
+    with open(output_file, "w") as f:
+        json.dump(combined, f, indent=4)
+    return combined
+
+
+def group_shards(shards: List[str], num_workers: int, worker_memory: Optional[int] = None) -> List[List[str]]:
+    """Split shards into groups of similar total size, one group per worker.
+
+    The on-disk size of a shard is used as the estimate of its resident memory. At least `num_workers` groups
+    are made, and more if needed to keep every group within `worker_memory` bytes.
+
+    Raises:
+        ValueError: If a single shard is larger than `worker_memory`.
+    """
+    sizes = {shard: os.path.getsize(shard) for shard in shards}
+    n_groups = min(max(num_workers, 1), len(shards))
+    if worker_memory is not None:
+        too_large = [shard for shard, size in sizes.items() if size > worker_memory]
+        if too_large:
+            raise ValueError(f"{len(too_large)} shards are larger than the worker memory budget, e.g. {too_large[0]}")
+        n_groups = max(n_groups, -(-sum(sizes.values()) // worker_memory))
+
+    while True:
+        # largest shard first into the currently smallest group
+        groups: List[List[str]] = [[] for _ in range(n_groups)]
+        loads = [0] * n_groups
+        for shard in sorted(shards, key=sizes.get, reverse=True):
+            i = loads.index(min(loads))
+            groups[i].append(shard)
+            loads[i] += sizes[shard]
+        if worker_memory is None or max(loads) <= worker_memory:
+            return [g for g in groups if g]
+        n_groups += 1
+
+
+class FMIndexService:
+    """Pool of long-lived `fm_query_server` workers, each keeping a group of FM-index shards loaded.
+
+    Query batches are sent to all workers at once and the per-worker counts are summed, so a lookup costs one
+    pass over resident indexes instead of reloading every shard from disk.
+
+    Args:
+        fm_index_dir: Directory containing the `.fm9` shards.
+        executable: Path to the compiled `fm_query_server.exe`.
+        num_workers: Number of worker processes (shard groups queried in parallel).
+        worker_memory: Optional memory budget per worker in bytes; more workers are started if needed.
+        shards: Optional explicit list of shards, overriding `fm_index_dir`.
+    """
+
+    def __init__(
+        self,
+        fm_index_dir: str | Path,
+        executable: str | Path,
+        num_workers: int = 16,
+        worker_memory: Optional[int] = None,
+        shards: Optional[List[str]] = None,
+    ):
+        shards = shards if shards is not None else find_shards(fm_index_dir)
+        if not shards:
+            raise ValueError(f"No FM-index shards found in {fm_index_dir}")
+        self.groups = group_shards(shards, num_workers, worker_memory)
+        self.lock = threading.Lock()
+        self.workers: List[subprocess.Popen] = []
+        logger.info(f"Starting {len(self.groups)} workers for {len(shards)} shards")
+        try:
+            for group in self.groups:
+                self.workers.append(
+                    subprocess.Popen(
+                        [str(executable), *group],
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        text=True,
+                        encoding="utf-8",
+                    )
+                )
+            for worker in self.workers:
+                self._expect(worker, "READY")
+        except Exception:
+            self.close()
+            raise
+        logger.info("All FM-index workers are ready")
+
+    @staticmethod
+    def _expect(worker: subprocess.Popen, prefix: str):
+        line = worker.stdout.readline()
+        if not line:
+            raise RuntimeError(f"FM-index worker exited with code {worker.wait()}")
+        if not line.startswith(prefix):
+            raise RuntimeError(f"FM-index worker error: {line.strip()}")
+
+    def _request(self, header: str, lines: List[str]) -> List[int]:
+        """Send one request to every worker and sum the counts they return."""
+        if any("\n" in line or "\r" in line for line in lines):
+            raise ValueError("Queries must not contain line breaks.")
+        request = "\n".join([header, *lines]) + "\n"
+        with self.lock:
+            # every worker reads its whole request before answering, so writing to all first cannot deadlock
+            for worker in self.workers:
+                worker.stdin.write(request)
+                worker.stdin.flush()
+            # read every worker's response before raising so that the next request starts in sync
+            responses = [worker.stdout.readline() for worker in self.workers]
+        totals = None
+        for line in responses:
+            if not line or line.startswith("ERROR"):
+                raise RuntimeError(f"FM-index worker error: {line.strip() or 'worker exited'}")
+            counts = [int(c) for c in line.split()]
+            totals = counts if totals is None else [a + b for a, b in zip(totals, counts)]
+        return totals or []
+
+    def count(self, queries: List[str], batch_size: int = 10000) -> List[int]:
+        """Count every query string across all shards.
+
+        Duplicate queries are only sent once; the result is aligned with `queries`.
+        """
+        unique = list(dict.fromkeys(queries))
+        counts: Dict[str, int] = {}
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start : start + batch_size]
+            counts.update(zip(batch, self._request(f"COUNT {len(batch)}", batch)))
+        return [counts[q] for q in queries]
+
+    def cooccur(
+        self, pairs: List[Tuple[str, str]], window: int = 100, max_locations: int = 1000, batch_size: int = 10000
+    ) -> List[int]:
+        """Count how often the two strings of each pair occur within `window` characters of each other.
+
+        Occurrences of the rarer string are located and their context is searched for the other string. Above
+        `max_locations` occurrences per shard, the count is an estimate from `max_locations` occurrences spread
+        evenly over all of them.
+        Pairs are unordered, so `(a, b)` and `(b, a)` are only counted once.
+        """
+        unique = list(dict.fromkeys(tuple(sorted(p)) for p in pairs))
+        counts: Dict[Tuple[str, str], int] = {}
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start : start + batch_size]
+            lines = [s for pair in batch for s in pair]
+            counts.update(zip(batch, self._request(f"COOCCUR {len(batch)} {window} {max_locations}", lines)))
+        return [counts[tuple(sorted(p))] for p in pairs]
+
+    def count_entities(self, entities: Dict[str, List[str]], batch_size: int = 10000) -> Dict[str, int]:
+        """Sum the counts of all names of every entity, like `fm_get_freq` does per shard."""
+        names = [name for entity_names in entities.values() for name in entity_names]
+        name_counts = dict(zip(names, self.count(names, batch_size)))
+        return {entity_id: sum(name_counts[n] for n in entity_names) for entity_id, entity_names in entities.items()}
+
+    def close(self):
+        for worker in self.workers:
+            if worker.poll() is None:
+                try:
+                    worker.stdin.write("QUIT\n")
+                    worker.stdin.close()
+                except (BrokenPipeError, OSError):
+                    pass
+        for worker in self.workers:
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,63 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""File helpers with the same behaviour as `deeponto.utils.{load_file, save_file, create_path}`.
+
+`deeponto.utils` imports torch and transformers on import, which dominates the runtime of the analysis tools.
+"""
+
+import json
+import pickle
+from pathlib import Path
+
+
+def load_file(save_path: str | Path):
+    """Load an object of a certain format."""
+    save_path = str(save_path)
+    if save_path.endswith(".json"):
+        with open(save_path) as input:
+            return json.load(input)
+    elif save_path.endswith(".pkl"):
+        with open(save_path, "rb") as input:
+            return pickle.load(input)
+    elif save_path.endswith(".yaml"):
+        import yaml
+
+        with open(save_path) as input:
+            return yaml.safe_load(input)
+    else:
+        raise RuntimeError(f"Unsupported loading format: {save_path}")
+
+
+def save_file(obj, save_path: str | Path, sort_keys: bool = False):
+    """Save an object to a certain format."""
+    save_path = str(save_path)
+    if save_path.endswith(".json"):
+        with open(save_path, "w") as output:
+            json.dump(obj, output, indent=4, separators=(",", ": "), sort_keys=sort_keys)
+    elif save_path.endswith(".pkl"):
+        with open(save_path, "wb") as output:
+            pickle.dump(obj, output, -1)
+    elif save_path.endswith(".yaml"):
+        import yaml
+
+        with open(save_path, "w") as output:
+            yaml.dump(obj, output, default_flow_style=False, allow_unicode=True)
+    else:
+        raise RuntimeError(f"Unsupported saving format: {save_path}")
+
+
+def create_path(path: str | Path):
+    """Create a path recursively."""
+    Path(path).mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,175 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+# Stages recorded by `probe.py` and `FactProbe.probe`
+STAGES = ["load", "render", "tokenize", "engine_forward", "engine_backward", "postprocess", "checkpoint"]
+ENGINE_STAGES = {"engine_forward", "engine_backward"}
+
+
+class NullMetrics:
+    """No-op metrics recorder used when instrumentation is disabled."""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def record_outputs(self, outputs):
+        pass
+
+    def end_batch(self, **labels):
+        pass
+
+
+class ProbeMetrics(NullMetrics):
+    """Record per-stage durations and counters for every batch of a probing run.
+
+    Each call to `end_batch` appends one record to `<run_name>.jsonl` and rewrites the Prometheus textfile
+    `<run_name>.prom` with the running totals. If `profile_stage` is set, that stage is run under `cProfile`
+    and the stats are dumped to `<run_name>_<stage>_<n>.prof`.
+
+    Args:
+        output_dir: Directory to write the metrics files to.
+        run_name: Prefix of the metrics files.
+        labels: Constant labels (e.g. relation and model) attached to every record and Prometheus sample.
+        profile_stage: Optional name of the stage to profile.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        run_name: str,
+        labels: Optional[Dict[str, str]] = None,
+        profile_stage: Optional[str] = None,
+    ):
+        if profile_stage is not None and profile_stage not in STAGES:
+            raise ValueError(f"Unknown stage to profile: {profile_stage}. Must be one of {STAGES}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(output_dir, f"{run_name}.jsonl")
+        self.prom_path = os.path.join(output_dir, f"{run_name}.prom")
+        self.output_dir = output_dir
+        self.run_name = run_name
+        self.labels = labels or {}
+        self.profile_stage = profile_stage
+        self.n_profiles = 0
+        self.n_batches = 0
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.total_stages: Dict[str, float] = {}
+        self.total_counters: Dict[str, int] = {}
+        self.last_throughput: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        profiler = None
+        if name == self.profile_stage:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.output_dir, f"{self.run_name}_{name}_{self.n_profiles}.prof"))
+                self.n_profiles += 1
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_outputs(self, outputs):
+        """Count prompts and tokens of vLLM `RequestOutput`s, including prefix-cache hits where reported."""
+        for output in outputs:
+            self.count("prompts")
+            self.count("prompt_tokens", len(output.prompt_token_ids or []))
+            self.count("generated_tokens", sum(len(o.token_ids) for o in output.outputs))
+            self.count("cached_prompt_tokens", getattr(output, "num_cached_tokens", None) or 0)
+
+    def _throughput(self, stages: Dict[str, float], counters: Dict[str, int]) -> Dict[str, float]:
+        engine_seconds = sum(v for k, v in stages.items() if k in ENGINE_STAGES)
+        tokens = counters.get("prompt_tokens", 0) + counters.get("generated_tokens", 0)
+        throughput = {
+            "prompts_per_sec": counters.get("prompts", 0) / engine_seconds if engine_seconds else 0.0,
+            "tokens_per_sec": tokens / engine_seconds if engine_seconds else 0.0,
+            "generated_tokens_per_sec": counters.get("generated_tokens", 0) / engine_seconds if engine_seconds else 0.0,
+        }
+        if counters.get("prompt_tokens"):
+            throughput["prefix_cache_hit_rate"] = counters.get("cached_prompt_tokens", 0) / counters["prompt_tokens"]
+        return {k: round(v, 4) for k, v in throughput.items()}
+
+    def end_batch(self, **labels):
+        """Write the stages and counters recorded since the last call as one record and reset them."""
+        throughput = self._throughput(self.stages, self.counters)
+        has_outputs = bool(self.counters.get("prompts"))
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            **self.labels,
+            **labels,
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            **throughput,
+        }
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        for k, v in self.stages.items():
+            self.total_stages[k] = self.total_stages.get(k, 0.0) + v
+        for k, v in self.counters.items():
+            self.total_counters[k] = self.total_counters.get(k, 0) + v
+        if has_outputs:
+            self.n_batches += 1
+            self.last_throughput = throughput
+        self.stages = {}
+        self.counters = {}
+        self.write_prometheus()
+
+    def write_prometheus(self):
+        """Write the running totals in the Prometheus textfile-collector format (atomically)."""
+        base_labels = ",".join(f'{k}="{v}"' for k, v in self.labels.items())
+
+        def fmt(labels: str) -> str:
+            labels = ",".join(filter(None, [base_labels, labels]))
+            return f"{{{labels}}}" if labels else ""
+
+        lines = [
+            "# HELP factprobe_stage_seconds_total Time spent in each probing stage.",
+            "# TYPE factprobe_stage_seconds_total counter",
+        ]
+        for k, v in sorted(self.total_stages.items()):
+            stage_label = 'stage="%s"' % k
+            lines.append(f"factprobe_stage_seconds_total{fmt(stage_label)} {v:.6f}")
+        for k, v in sorted(self.total_counters.items()):
+            lines.append(f"# TYPE factprobe_{k}_total counter")
+            lines.append(f"factprobe_{k}_total{fmt('')} {v}")
+        lines.append("# TYPE factprobe_batches_total counter")
+        lines.append(f"factprobe_batches_total{fmt('')} {self.n_batches}")
+        for k, v in sorted(self.last_throughput.items()):
+            lines.append(f"# TYPE factprobe_last_batch_{k} gauge")
+            lines.append(f"factprobe_last_batch_{k}{fmt('')} {v}")
+
+        tmp_path = self.prom_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
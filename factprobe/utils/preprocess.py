@@ -64,3 +64,14 @@ def remove_lowercased_duplicates(names: list[str]):
     """
     uppercased_set = {name.upper() for name in names}  # Collect all names in uppercase form
     return [name for name in names if name != name.lower() or name.upper() not in uppercased_set]
+
+
+def preprocess_names(names: list[str], remove_parenthesis: bool = False, english_only: bool = True):
+    """
+    Apply the name cleaning steps above in order: clean and deduplicate, drop non-English names,
+    and drop lower-cased duplicates.
+    """
+    names = clean_names(names, remove_parenthesis)
+    if english_only:
+        names = filter_nonenglish_names(names)
+    return remove_lowercased_duplicates(names)
@@ -0,0 +1,65 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stand-in for `fm_query_server.exe` that treats every shard as a plain text file.
+
+It speaks the same stdin/stdout protocol, so `FMIndexService` can be tested without sdsl. If the environment
+variable `FAKE_FM_QUERY_LOG` is set, every request header is appended to that file.
+"""
+
+import os
+import sys
+
+
+def cooccur(text: str, a: str, b: str, window: int) -> int:
+    # occurrences of the rarer string with the other one within `window` characters before or after it
+    if text.count(a) > text.count(b):
+        a, b = b, a
+    hits, i = 0, text.find(a)
+    while i != -1:
+        hits += b in text[max(i - window - len(b), 0) : i + len(a) + window + len(b)]
+        i = text.find(a, i + 1)
+    return hits
+
+
+def main():
+    texts = []
+    for path in sys.argv[1:]:
+        with open(path) as f:
+            texts.append(f.read())
+    log_path = os.environ.get("FAKE_FM_QUERY_LOG")
+    print(f"READY {len(texts)}", flush=True)
+
+    for line in sys.stdin:
+        if log_path:
+            with open(log_path, "a") as log:
+                log.write(line)
+        op, *args = line.split()
+        if op == "QUIT":
+            break
+        elif op == "COUNT":
+            queries = [sys.stdin.readline().rstrip("\n") for _ in range(int(args[0]))]
+            counts = [sum(t.count(q) for t in texts) for q in queries]
+        elif op == "COOCCUR":
+            n, window, _ = map(int, args)
+            strings = [sys.stdin.readline().rstrip("\n") for _ in range(2 * n)]
+            counts = [sum(cooccur(t, strings[2 * i], strings[2 * i + 1], window) for t in texts) for i in range(n)]
+        else:
+            print(f"ERROR: Unknown request: {line.strip()}", flush=True)
+            continue
+        print(" ".join(map(str, counts)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
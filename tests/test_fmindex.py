@@ -0,0 +1,146 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Protocol tests of `FMIndexService` against `fake_fm_query_server.py`.
+
+`test_real_server` additionally runs the compiled `fm_query_server.exe` on a small index built with
+`fm_index_build.exe` when both are given via `FM_QUERY_SERVER` and `FM_INDEX_BUILD`.
+"""
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from factprobe.utils.fmindex import FMIndexService, find_shards, group_shards
+
+FAKE_SERVER = Path(__file__).parent / "fake_fm_query_server.py"
+
+SHARDS = {
+    "a.fm9": "the cat sat on the mat. the dog sat on the cat.",
+    "b.fm9": "a cat and a dog.",
+    "sub/c.fm9": "the mat is red. the cat is here.",
+}
+
+
+def _executable(path: Path, body: str) -> str:
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    for name, text in SHARDS.items():
+        (tmp_path / "index" / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "index" / name).write_text(text)
+    return tmp_path / "index"
+
+
+@pytest.fixture
+def fake_server(tmp_path):
+    return _executable(tmp_path / "fake_server.sh", f'exec "{sys.executable}" "{FAKE_SERVER}" "$@"')
+
+
+def test_group_shards(index_dir):
+    shards = find_shards(index_dir)
+    assert len(shards) == 3
+    groups = group_shards(shards, num_workers=2)
+    assert len(groups) == 2
+    assert sorted(s for g in groups for s in g) == shards
+    # a budget below the total size forces more groups than workers
+    largest = max(os.path.getsize(s) for s in shards)
+    assert len(group_shards(shards, num_workers=1, worker_memory=largest)) >= 2
+    with pytest.raises(ValueError):
+        group_shards(shards, num_workers=1, worker_memory=largest - 1)
+
+
+def test_count_sums_across_groups(index_dir, fake_server):
+    with FMIndexService(index_dir, fake_server, num_workers=2) as service:
+        assert len(service.workers) == 2
+        assert service.count(["cat", "dog", "mat", "zebra"]) == [4, 2, 2, 0]
+        assert service.count_entities({"Q1": ["cat", "dog"], "Q2": ["zebra"]}) == {"Q1": 6, "Q2": 0}
+
+
+def test_duplicate_queries_are_sent_once(index_dir, fake_server, tmp_path, monkeypatch):
+    log_path = tmp_path / "requests.log"
+    monkeypatch.setenv("FAKE_FM_QUERY_LOG", str(log_path))
+    with FMIndexService(index_dir, fake_server, num_workers=1) as service:
+        assert service.count(["cat", "dog", "cat", "cat"]) == [4, 2, 4, 4]
+        assert service.cooccur([("cat", "mat"), ("mat", "cat")], window=15) == [2, 2]
+    assert log_path.read_text().splitlines() == ["COUNT 2", "COOCCUR 1 15 1000", "QUIT"]
+
+
+def test_cooccur_sums_across_groups(index_dir, fake_server):
+    with FMIndexService(index_dir, fake_server, num_workers=3) as service:
+        # mentions of the rarer string with the other one at most `window` characters away, summed over shards
+        assert service.cooccur([("cat", "mat"), ("cat", "dog"), ("cat", "zebra")], window=15) == [2, 2, 0]
+        assert service.cooccur([("cat", "mat")], window=10) == [0]
+
+
+def test_error_response(index_dir, fake_server):
+    with FMIndexService(index_dir, fake_server, num_workers=2) as service:
+        with pytest.raises(RuntimeError, match="Unknown request"):
+            service._request("FOO 0", [])
+        # all workers' error lines were consumed, so later requests stay in sync
+        assert service.count(["cat"]) == [4]
+        with pytest.raises(ValueError):
+            service.count(["two\nlines"])
+
+
+def test_worker_failure_on_startup(index_dir, tmp_path):
+    failing = _executable(tmp_path / "failing.sh", 'echo "ERROR: Could not load FM-index $1"')
+    with pytest.raises(RuntimeError, match="Could not load"):
+        FMIndexService(index_dir, failing, num_workers=1)
+    crashing = _executable(tmp_path / "crashing.sh", "exit 3")
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        FMIndexService(index_dir, crashing, num_workers=1)
+
+
+@pytest.mark.skipif(
+    not (os.environ.get("FM_QUERY_SERVER") and os.environ.get("FM_INDEX_BUILD")),
+    reason="FM_QUERY_SERVER and FM_INDEX_BUILD are not set",
+)
+def test_real_server(tmp_path):
+    for name, text in SHARDS.items():
+        path = tmp_path / "text" / name.replace(".fm9", ".txt")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        subprocess.run([os.environ["FM_INDEX_BUILD"], str(path)], check=True, capture_output=True)
+        shutil.move(f"{path}.fm9", tmp_path / "text" / name)
+    with FMIndexService(tmp_path / "text", os.environ["FM_QUERY_SERVER"], num_workers=2) as service:
+        assert service.count(["cat", "dog", "mat", "zebra", "cat"]) == [4, 2, 2, 0, 4]
+        assert service.cooccur([("cat", "mat"), ("dog", "cat"), ("cat", "zebra")], window=15) == [2, 2, 0]
+        assert service.cooccur([("cat", "mat")], window=10) == [0]
+        with pytest.raises(RuntimeError, match="Unknown request"):
+            service._request("FOO 0", [])
+        assert service.count(["the cat"]) == [3]
+
+
+@pytest.mark.skipif(
+    not (os.environ.get("FM_QUERY_SERVER") and os.environ.get("FM_INDEX_BUILD")),
+    reason="FM_QUERY_SERVER and FM_INDEX_BUILD are not set",
+)
+def test_real_server_cooccur_sampling(tmp_path):
+    # suffixes of "cat" are sorted by what follows it, so all mentions next to "zzz" come first in its range
+    text_path = tmp_path / "shard.txt"
+    text_path.write_text("cat bbb qqq.\n" * 50 + "cat aaa zzz.\n" * 50 + "zzz " * 200)
+    subprocess.run([os.environ["FM_INDEX_BUILD"], str(text_path)], check=True, capture_output=True)
+    with FMIndexService(tmp_path, os.environ["FM_QUERY_SERVER"], num_workers=1) as service:
+        assert service.cooccur([("cat", "zzz")], window=5) == [50]
+        assert service.cooccur([("cat", "zzz")], window=5, max_locations=10) == [50]
@@ -0,0 +1,110 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of `FactJudge` with a stub judge engine and of analysing unjudged results."""
+
+from dataclasses import dataclass, field
+from typing import List
+
+import click
+import pytest
+
+from benchmarks.synthetic import FakeCompletionOutput, FakeLLM, FakeRequestOutput, make_relation_df, make_results
+from factprobe.judge import FactJudge
+from factprobe.utils.analysis import analyse_results_all_freqs, freq_dict_from_triple_df
+
+
+@dataclass
+class StubJudge(FakeLLM):
+    """Affirms every response that contains "yes" and records the user messages it was asked to judge."""
+
+    seen: List[str] = field(default_factory=list)
+
+    def _answer(self, content: str) -> FakeRequestOutput:
+        self.seen.append(content)
+        text = "Yes." if "yes" in content.lower() else "No"
+        return FakeRequestOutput(prompt_token_ids=[], outputs=[FakeCompletionOutput(text, [], [])])
+
+
+def _results(texts: List[str], answer_em: List[bool]):
+    entry = {"text": texts, "answer_em": answer_em}
+    return {
+        "forward": {("Q1", "Q2"): dict(entry)},
+        "backward": {("Q1", "Q2"): {"text": ["No"], "answer_em": [False]}},
+    }
+
+
+def test_em_passes_are_not_judged():
+    llm = StubJudge()
+    results = _results(["Yes", " yes, indeed ", "not sure"], [True, False, False])
+    stats = FactJudge(llm, "judge", "question").judge([results])
+
+    assert sorted(llm.seen) == ["No", "not sure", "yes, indeed"]
+    assert stats["outputs"] == 4
+    assert stats["failed_em"] == 3
+    assert stats["affirmed"] == 1
+
+
+def test_identical_texts_are_judged_once():
+    llm = StubJudge()
+    results = [
+        _results(["Yes sure ", "No"], [False, False]),
+        _results(["\nYes sure", "Yes sure"], [False, False]),
+    ]
+    stats = FactJudge(llm, "judge", "question", batch_size=1).judge(results)
+
+    assert sorted(llm.seen) == ["No", "Yes sure"]
+    assert stats["distinct"] == 2
+    assert stats["judged"] == 2
+    assert llm.calls == 2  # one engine call per batch of one text
+
+
+def test_answer_judge_is_em_or_verdict():
+    results = _results(["False", "Yes", "yes it is", "No"], [True, True, False, False])
+    FactJudge(StubJudge(), "judge", "question").judge([results])
+
+    # the verdict of "False" would be negative, but it passed EM
+    assert results["forward"][("Q1", "Q2")]["answer_judge"] == [True, True, True, False]
+    assert results["backward"][("Q1", "Q2")]["answer_judge"] == [False]
+
+
+@pytest.mark.parametrize("suffix", [".json", ".pkl"])
+def test_cache_round_trip(tmp_path, suffix):
+    cache_path = str(tmp_path / f"verdicts{suffix}")
+    results = _results(["yes", "no"], [False, False])
+    FactJudge(StubJudge(), "judge", "question", cache_path=cache_path).judge([results])
+
+    llm = StubJudge()
+    cached = _results(["yes", "no"], [False, False])
+    stats = FactJudge(llm, "judge", "question", cache_path=cache_path).judge([cached])
+    assert llm.seen == []
+    assert stats["judged"] == 0
+    assert cached["forward"][("Q1", "Q2")]["answer_judge"] == results["forward"][("Q1", "Q2")]["answer_judge"]
+
+    # verdicts are kept per judge model, mode and reference answer
+    for model_name, mode, template_type in [
+        ("other-judge", "affirmation", "question"),
+        ("judge", "semantic_match", "question"),
+        ("judge", "affirmation", "statement"),
+    ]:
+        llm = StubJudge()
+        FactJudge(llm, model_name, template_type, mode=mode, cache_path=cache_path).judge([cached])
+        assert len(llm.seen) == 3
+
+
+def test_unjudged_results_are_rejected():
+    df = make_relation_df(20, 2)
+    results = make_results(df, 2)
+    with pytest.raises(click.UsageError, match="factprobe judge"):
+        analyse_results_all_freqs(results, freq_dict_from_triple_df(df), "high2low", answer_key="answer_judge")
@@ -0,0 +1,156 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of `ChatPretokenizer` on small word-level tokenizers saved to a temporary directory."""
+
+import sqlite3
+from array import array
+
+import pytest
+
+tokenizers = pytest.importorskip("tokenizers")
+transformers = pytest.importorskip("transformers")
+
+from factprobe.pretokenize import ChatPretokenizer, _load_tokenizer, template_ids, tokenizer_fingerprint  # noqa: E402
+
+CHATML = (
+    "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{{ m['content'] }}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+# Renders the user message twice, so it cannot be split around a single sentinel
+REPEAT = "{% for m in messages %}{{ m['content'] }} {{ m['content'] }}\n{% endfor %}"
+# Glues the messages together, so the prefix and the user message merge into one unknown word
+GLUED = "{% for m in messages %}{{ m['content'] }}{% endfor %}"
+
+CORPUS = [
+    "system user assistant",
+    "Answer the question",
+    "Alice lives in Paris",
+    "Bob lives in London",
+    "The capital of France is Paris",
+]
+SYSTEM = "Answer the question"
+USERS = ["Alice lives in Paris", "Bob lives in London", "The capital of France is Paris", "Alice and Bob"]
+
+
+def _save_tokenizer(path, chat_template=CHATML, lowercase=False):
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tok = Tokenizer(models.WordLevel(unk_token="[UNK]"))
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    tok.train_from_iterator(CORPUS, trainers.WordLevelTrainer(special_tokens=["[UNK]", "<|im_start|>", "<|im_end|>"]))
+    if lowercase:
+        tok.normalizer = normalizers.Lowercase()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="[UNK]", eos_token="<|im_end|>")
+    tokenizer.chat_template = chat_template
+    tokenizer.save_pretrained(path)
+    return str(path)
+
+
+def _conversations(users=USERS, system=SYSTEM):
+    return [[{"role": "system", "content": system}, {"role": "user", "content": u}] for u in users]
+
+
+def _expected(name, conversations):
+    tokenizer = _load_tokenizer(name)
+    return [template_ids(tokenizer, c) for c in conversations]
+
+
+@pytest.fixture
+def chatml(tmp_path):
+    return _save_tokenizer(tmp_path / "chatml")
+
+
+def test_prefix_path_matches_template(chatml):
+    conversations = _conversations()
+    with ChatPretokenizer(chatml, num_workers=0) as pretokenizer:
+        assert pretokenizer.tokenize(conversations) == _expected(chatml, conversations)
+        assert pretokenizer.templates[SYSTEM] is not None  # the prefix path was used
+
+
+@pytest.mark.parametrize("chat_template", [REPEAT, GLUED])
+def test_fallback_matches_template(tmp_path, chat_template):
+    name = _save_tokenizer(tmp_path / "tokenizer", chat_template=chat_template)
+    conversations = _conversations()
+    with ChatPretokenizer(name, num_workers=0) as pretokenizer:
+        assert pretokenizer.tokenize(conversations) == _expected(name, conversations)
+        assert pretokenizer.templates[SYSTEM] is None
+
+
+def test_other_conversations_are_templated_in_full(chatml):
+    conversations = [
+        [{"role": "user", "content": "Alice lives in Paris"}],
+        [
+            {"role": "system", "content": SYSTEM},
+            {"role": "user", "content": "Bob"},
+            {"role": "assistant", "content": "London"},
+        ],
+    ]
+    with ChatPretokenizer(chatml, num_workers=0) as pretokenizer:
+        assert pretokenizer.tokenize(conversations) == _expected(chatml, conversations)
+
+
+def test_pool_matches_in_process(chatml):
+    conversations = _conversations(USERS * 3) + _conversations(USERS, system="Bob lives in London")
+    with ChatPretokenizer(chatml, num_workers=0) as pretokenizer:
+        in_process = pretokenizer(conversations)
+    with ChatPretokenizer(chatml, num_workers=2, chunk_size=3) as pretokenizer:
+        pooled = pretokenizer(conversations)
+        assert pretokenizer.pool is not None
+    assert pooled == in_process
+    assert [p["prompt_token_ids"] for p in pooled] == _expected(chatml, conversations)
+
+
+def test_cache_round_trip(chatml, tmp_path):
+    conversations = _conversations()
+    cache_dir = tmp_path / "cache"
+    with ChatPretokenizer(chatml, num_workers=0, cache_dir=cache_dir) as pretokenizer:
+        first = pretokenizer.tokenize(conversations)
+    (cache_file,) = cache_dir.glob("*.sqlite")
+    with sqlite3.connect(cache_file) as db:
+        assert db.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == len(conversations)
+
+    with ChatPretokenizer(chatml, num_workers=0, cache_dir=cache_dir) as pretokenizer:
+        # only served from the cache: the prefix template is never rendered
+        assert pretokenizer.tokenize(conversations + conversations[:1]) == first + first[:1]
+        assert pretokenizer.templates == {}
+
+
+def test_stale_cache_hits_are_replaced(chatml, tmp_path):
+    conversations = _conversations()
+    cache_dir = tmp_path / "cache"
+    with ChatPretokenizer(chatml, num_workers=0, cache_dir=cache_dir) as pretokenizer:
+        expected = pretokenizer.tokenize(conversations)
+    (cache_file,) = cache_dir.glob("*.sqlite")
+    with sqlite3.connect(cache_file) as db:
+        db.execute("UPDATE prompts SET ids = ?", (array("i", [0, 0]).tobytes(),))
+
+    with ChatPretokenizer(chatml, num_workers=0, cache_dir=cache_dir) as pretokenizer:
+        assert pretokenizer.tokenize(conversations) == expected
+        assert not pretokenizer.cache_valid
+    with ChatPretokenizer(chatml, num_workers=0, cache_dir=cache_dir) as pretokenizer:
+        assert pretokenizer.tokenize(conversations) == expected
+        assert pretokenizer.cache_valid
+
+
+def test_fingerprint(tmp_path):
+    same = [_load_tokenizer(_save_tokenizer(tmp_path / name)) for name in ["a", "b"]]
+    lowercase = _load_tokenizer(_save_tokenizer(tmp_path / "lowercase", lowercase=True))
+    other_template = _load_tokenizer(_save_tokenizer(tmp_path / "glued", chat_template=GLUED))
+
+    assert lowercase.encode("Alice") != same[0].encode("Alice")
+    assert tokenizer_fingerprint(same[0]) == tokenizer_fingerprint(same[1])
+    assert tokenizer_fingerprint(lowercase) != tokenizer_fingerprint(same[0])
+    assert tokenizer_fingerprint(other_template) != tokenizer_fingerprint(same[0])
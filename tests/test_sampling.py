@@ -0,0 +1,153 @@
+# Copyright 2025 Yuan He
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the stopping and resume logic of `SequentialSampler` on synthetic relation frames."""
+
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import pytest
+
+from benchmarks.synthetic import make_relation_df
+from factprobe.sampling import STOP_BUDGET, STOP_CI_WIDTH, STOP_EXHAUSTED, STOP_SIGNIFICANT, SequentialSampler
+from factprobe.utils.analysis import freq_dict_from_triple_df
+
+# Paired (forward, backward) correctness of a triple
+Outcome = Tuple[int, int]
+
+CONCORDANT = [(1, 1)]
+
+
+def _frame(object_counts: List[int], subject_count: int = 10**6):
+    """Synthetic relation whose high-frequency subjects point to objects with the given counts."""
+    df = make_relation_df(len(object_counts), 1)
+    df["subject_count"] = subject_count
+    df["object_count"] = object_counts
+    return df
+
+
+def _sampler(df, **kwargs) -> SequentialSampler:
+    return SequentialSampler(df, freq_dict_from_triple_df(df), "high2low", **kwargs)
+
+
+def _run(sampler: SequentialSampler, pattern: List[Outcome], results: Dict | None = None):
+    """Probe rounds until every bucket has stopped, cycling `pattern` over the triples a bucket draws per round.
+
+    Returns the results and the keys drawn by every round.
+    """
+    results = results or {"forward": {}, "backward": {}}
+    rounds = []
+    sampler.update(results)
+    while not sampler.done:
+        batch = sampler.next_round()
+        keys = list(batch[["subject", "object"]].itertuples(index=False, name=None))
+        position = Counter()
+        for k in keys:
+            bucket = sampler.key_to_bucket[k].name
+            forward, backward = pattern[position[bucket] % len(pattern)]
+            position[bucket] += 1
+            results["forward"][k] = {"answer_em": [bool(forward)]}
+            results["backward"][k] = {"answer_em": [bool(backward)]}
+        rounds.append(keys)
+        sampler.update(results)
+    return results, rounds
+
+
+def test_boundaries_go_to_first_bucket():
+    df = _frame([0, 500, 1000, 5000, 10000, 50000, 100000, 10**6])
+    sampler = _sampler(df)
+    assert [len(b.pool) for b in sampler.buckets] == [3, 2, 2]
+
+    key_of = dict(zip(df["object_count"], zip(df["subject"], df["object"])))
+    assert sampler.key_to_bucket[key_of[1000]] is sampler.buckets[0]
+    assert sampler.key_to_bucket[key_of[10000]] is sampler.buckets[1]
+    assert sampler.key_to_bucket[key_of[100000]] is sampler.buckets[2]
+    assert key_of[10**6] not in sampler.key_to_bucket  # a high-frequency object is in no bucket
+
+
+def test_stop_significant():
+    sampler = _sampler(_frame([500] * 300), round_size=50, budget=200)
+    _, rounds = _run(sampler, [(1, 0)])
+
+    bucket = sampler.buckets[0]
+    assert bucket.stop_reason == STOP_SIGNIFICANT
+    assert len(rounds) == 1
+    assert (bucket.total, bucket.n10, bucket.n01) == (50, 50, 0)
+
+
+@pytest.mark.parametrize("budget, expected_rounds", [(50, 1), (200, 2)])
+def test_alpha_is_split_over_rounds(budget, expected_rounds):
+    # 8 vs. 1 discordant pairs per round: p ~ 0.021 after one round, which is only significant without splitting
+    pattern = [(1, 0)] * 8 + [(0, 1)] + [(1, 1)] * 41
+    sampler = _sampler(_frame([500] * 300), round_size=50, budget=budget, alpha=0.05)
+    assert sampler.alpha_per_round == pytest.approx(0.05 / (budget // 50))
+    _, rounds = _run(sampler, pattern)
+
+    assert sampler.buckets[0].stop_reason == STOP_SIGNIFICANT
+    assert len(rounds) == expected_rounds
+
+
+def test_stop_ci_width():
+    pattern = [(1, 0)] * 5 + [(0, 1)] * 5 + [(1, 1)] * 40
+    sampler = _sampler(_frame([500] * 300), round_size=50, budget=200, ci_width=0.5, min_discordant=10)
+    _, rounds = _run(sampler, pattern)
+
+    bucket = sampler.buckets[0]
+    assert bucket.stop_reason == STOP_CI_WIDTH
+    assert len(rounds) == 1
+    ci_low, ci_high = bucket.diff_ci(sampler.confidence)
+    assert ci_high - ci_low <= 0.5
+
+
+def test_ci_width_needs_discordant_pairs():
+    # without discordant pairs the interval is already narrow after one round, but may not stop the bucket
+    sampler = _sampler(_frame([500] * 300), round_size=50, budget=200, ci_width=0.5, min_discordant=10)
+    _, rounds = _run(sampler, CONCORDANT)
+
+    bucket = sampler.buckets[0]
+    assert bucket.stop_reason == STOP_BUDGET
+    assert len(rounds) == 4
+    assert bucket.drawn == bucket.total == 200
+    assert len(bucket.pool) == 100
+
+
+def test_stop_exhausted():
+    sampler = _sampler(_frame([500] * 120), round_size=50, budget=200)
+    _, rounds = _run(sampler, CONCORDANT)
+
+    bucket = sampler.buckets[0]
+    assert bucket.stop_reason == STOP_EXHAUSTED
+    assert [len(r) for r in rounds] == [50, 50, 20]
+    assert bucket.total == 120
+    # buckets without triples stop before the first round
+    assert [b.stop_reason for b in sampler.buckets[1:]] == [STOP_EXHAUSTED, STOP_EXHAUSTED]
+
+
+def test_resumed_results_count_towards_budget():
+    df = _frame([500] * 300)
+    resumed = list(zip(df["subject"], df["object"]))[:30]
+    results = {
+        "forward": {k: {"answer_em": [True]} for k in resumed},
+        "backward": {k: {"answer_em": [True]} for k in resumed},
+    }
+    sampler = _sampler(df, round_size=50, budget=100)
+    _, rounds = _run(sampler, CONCORDANT, results)
+
+    bucket = sampler.buckets[0]
+    assert bucket.stop_reason == STOP_BUDGET
+    assert bucket.drawn == bucket.total == 100
+    assert [len(r) for r in rounds] == [50, 20]
+    drawn = [k for r in rounds for k in r]
+    assert len(set(drawn)) == len(drawn)
+    assert not set(drawn) & set(resumed)